@@ -1,29 +1,21 @@
 # admin.py
 
 import streamlit as st
-from database import (
-    get_user_count,
-    get_group_count,
-    get_poll_count,
-    get_active_user_count,
-    get_all_polls,
-    get_poll_by_id,
-    create_poll,
-    add_option,
-    get_users_by_role,
-    insert_user,
-    update_user_role,
-    delete_user,
-    get_all_users,
-    create_group,
-    get_user_by_id,get_user_by_username,create_connection
-)
+from poll_index import POLL_TYPES
+from repository import get_repository
 
 from datetime import datetime, date, time
+import os
+import tempfile
 from chat import admin_chat
+from export import EXPORTS, parquet_available
+from poll_picker import select_poll
+from poll_results import show_ranked_results, show_turnout
 from auth import logout
 import pandas as pd
-from utils import hash_password
+from utils import hash_password, get_hashing_stats
+import perf
+from perf import page
 def admin_dashboard():
     st.sidebar.title("Admin Dashboard")
     options = [
@@ -33,34 +25,43 @@ def admin_dashboard():
         "Create Private Poll",
         "Manage Group Admins",
         "Chat",
+        "Export Data",
+        "Performance",
         "Logout",
     ]
     choice = st.sidebar.selectbox("Select an option", options)
 
-    if choice == "Dashboard":
-        show_dashboard()
-    elif choice == "Monitor Polls":
-        monitor_polls()
-    elif choice == "Create Public Poll":
-        create_new_poll(is_public=True)
-    elif choice == "Create Private Poll":
-        create_new_poll(is_public=False)
-    elif choice == "Manage Group Admins":
-        manage_group_admins()
-    elif choice == "Chat":
-        admin_chat()
-    elif choice == "Logout":
-        logout()
-    else:
-        st.error("Invalid choice.")
+    with page(f"admin/{choice}"):
+        if choice == "Dashboard":
+            show_dashboard()
+        elif choice == "Monitor Polls":
+            monitor_polls()
+        elif choice == "Create Public Poll":
+            create_new_poll(is_public=True)
+        elif choice == "Create Private Poll":
+            create_new_poll(is_public=False)
+        elif choice == "Manage Group Admins":
+            manage_group_admins()
+        elif choice == "Chat":
+            admin_chat()
+        elif choice == "Export Data":
+            export_data()
+        elif choice == "Performance":
+            show_performance()
+        elif choice == "Logout":
+            logout()
+        else:
+            st.error("Invalid choice.")
 
 def show_dashboard():
+    repo = get_repository()
     st.header("Admin Dashboard")
     # Display general data
-    user_count = get_user_count()
-    group_count = get_group_count()
-    poll_count = get_poll_count()
-    active_user_count = get_active_user_count()
+    stats = repo.get_dashboard_stats()
+    user_count = stats['total_users']
+    group_count = stats['total_groups']
+    poll_count = stats['total_polls']
+    active_user_count = stats['active_voters']
 
     col1, col2 = st.columns(2)
     with col1:
@@ -80,7 +81,7 @@ def show_dashboard():
 
     # Display live poll details
     st.subheader("Live Polls")
-    current_polls = get_current_polls_admin()
+    current_polls = repo.get_current_polls_admin()
     if current_polls:
         for poll in current_polls:
             st.write(f"**{poll['poll_question']}**")
@@ -90,29 +91,93 @@ def show_dashboard():
         st.info("No live polls at the moment.")
 
 def monitor_polls():
+    repo = get_repository()
     st.header("Monitor Polls")
-    polls = get_all_polls()
-    if polls:
-        poll_options = [f"{poll[0]}: {poll[1]}" for poll in polls]
-        selected_poll_str = st.selectbox("Select a poll to monitor:", poll_options)
-        selected_poll_id = int(selected_poll_str.split(":")[0])
-
-        poll = get_poll_by_id(selected_poll_id)
+    creators = {user[1]: user[0] for user in repo.get_users_by_role('admin') + repo.get_users_by_role('group_admin')}
+    selected_poll_id = select_poll('admin_monitor', creators=creators)
+    if selected_poll_id is not None:
+        poll = repo.get_poll_by_id(selected_poll_id)
         if poll:
             st.subheader(f"Poll: {poll['poll_question']}")
-            results = get_vote_counts(selected_poll_id)
-            if results:
-                df = pd.DataFrame(results, columns=["Option", "Votes"])
-                st.bar_chart(df.set_index("Option"))
-                st.table(df)
+            if poll['poll_type'] == 'ranked':
+                show_ranked_results(repo.get_ranked_choice_results(selected_poll_id))
             else:
-                st.info("No votes have been cast in this poll yet.")
+                results = repo.get_final_vote_counts(selected_poll_id)
+                if results:
+                    df = pd.DataFrame(results, columns=["Option", "Votes"])
+                    st.bar_chart(df.set_index("Option"))
+                    st.table(df)
+                else:
+                    st.info("No votes have been cast in this poll yet.")
+            show_turnout(repo.get_vote_turnout(selected_poll_id), key="turnout_resolution_admin")
         else:
             st.error("Poll not found.")
+
+def export_data():
+    st.header("Export Data")
+    name = st.selectbox("Data:", list(EXPORTS), format_func=str.capitalize)
+    formats = ["csv", "parquet"] if parquet_available() else ["csv"]
+    fmt = st.selectbox("Format:", formats, format_func=str.upper)
+    poll_id = None
+    if 'poll_id' in EXPORTS[name]['filters']:
+        poll_id = st.number_input("Poll ID (0 for all polls):", min_value=0, step=1) or None
+    if st.button("Prepare Export"):
+        # The export streams into a temporary file; only the download reads it back whole.
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"{name}.{fmt}")
+            try:
+                count = get_repository().export_to_file(name, path, fmt, poll_id=poll_id)
+            except NotImplementedError as e:
+                st.error(str(e))
+                return
+            with open(path, 'rb') as f:
+                data = f.read()
+        st.success(f"Exported {count} row(s).")
+        st.download_button(f"Download {name}.{fmt}", data, file_name=f"{name}.{fmt}")
+
+def show_performance():
+    repo = get_repository()
+    st.header("Performance")
+    if st.button("Reset statistics"):
+        perf.reset()
+
+    st.subheader("Queries per page")
+    page_stats = perf.get_page_stats()
+    if page_stats:
+        st.dataframe(pd.DataFrame(page_stats), hide_index=True)
+    else:
+        st.info("No pages rendered since the last reset.")
+
+    st.subheader("Database functions")
+    function_stats = perf.get_function_stats()
+    if not function_stats:
+        st.info("No database calls recorded since the last reset.")
     else:
-        st.info("No polls available.")
+        df = pd.DataFrame(function_stats).drop(columns=["slowest_sql"])
+        st.dataframe(df, hide_index=True)
+
+        st.subheader("Slowest calls")
+        slowest = sorted(function_stats, key=lambda row: row['max_ms'], reverse=True)[:10]
+        for row in slowest:
+            with st.expander(f"{row['function']}: {row['max_ms']:.2f} ms, {len(row['slowest_sql'])} statement(s)"):
+                for sql in row['slowest_sql']:
+                    st.code(sql, language="sql")
+                    try:
+                        plan = repo.explain_query_plan(sql)
+                    except Exception as e:
+                        st.caption(f"No query plan: {e}")
+                        continue
+                    if plan:
+                        st.text("\n".join(detail for _, _, _, detail in plan))
+
+    st.subheader("Caches and password hashing")
+    st.json({
+        **repo.get_cache_stats(),
+        'password_hashing': get_hashing_stats(),
+    })
 
 def create_new_poll(is_public):
+    repo = get_repository()
     st.header("Create a New Poll")
     poll_question = st.text_input("Poll Question:")
        # Start Date and Time
@@ -130,7 +195,7 @@ def create_new_poll(is_public):
 
     if not is_public:
         # For private polls, select groups
-        groups = get_all_groups()
+        groups = repo.get_all_groups()
         if groups:
             group_options = [f"{group[0]}: {group[1]}" for group in groups]
             selected_group_str = st.selectbox("Select a group:", group_options)
@@ -141,24 +206,20 @@ def create_new_poll(is_public):
     else:
         group_id = None  # Public poll
 
-    options = []
-    option1 = st.text_input("Option 1:")
-    option2 = st.text_input("Option 2:")
-    option3 = st.text_input("Option 3 (optional):")
-    option4 = st.text_input("Option 4 (optional):")
+    poll_type = st.selectbox("Poll type:", list(POLL_TYPES), format_func=POLL_TYPES.get)
+    num_options = st.number_input("Number of options:", min_value=2, value=2, step=1)
+    option_inputs = [st.text_input(f"Option {i + 1}:", key=f"option_{i}") for i in range(int(num_options))]
+    options = [option.strip() for option in option_inputs if option.strip()]
+    distinct_options = len(set(options)) == len(options)
+    if not distinct_options:
+        st.warning("Options must all be different.")
 
     if st.button("Create Poll"):
-        if poll_question and option1 and option2 and start_time < end_time:
+        if poll_question and len(options) >= 2 and distinct_options and start_datetime < end_datetime:
             creator_id = st.session_state.user_id
-            poll_id = create_poll(
-                poll_question, is_public, creator_id, group_id, start_datetime, end_datetime
+            repo.create_poll_with_options(
+                poll_question, is_public, creator_id, group_id, start_datetime, end_datetime, options, poll_type
             )
-            add_option(poll_id, option1)
-            add_option(poll_id, option2)
-            if option3:
-                add_option(poll_id, option3)
-            if option4:
-                add_option(poll_id, option4)
             st.success("Poll created successfully.")
         else:
             st.error("Please fill out all required fields.")
@@ -174,6 +235,7 @@ def manage_group_admins():
         view_edit_group_admins()
 
 def create_group_admin():
+    repo = get_repository()
     st.subheader("Create a Group Admin")
     username = st.text_input("Username:")
     password = st.text_input("Password:", type="password")
@@ -187,25 +249,26 @@ def create_group_admin():
             st.error("Please fill out all fields.")
         else:
             # Check if username already exists
-            existing_user = get_user_by_username(username)
+            existing_user = repo.get_user_by_username(username)
             if existing_user:
                 st.error("Username already exists.")
             else:
                 password_hash = hash_password(password)
-                user_id = insert_user(username, password_hash, role="group_admin")
+                user_id = repo.insert_user(username, password_hash, role="group_admin")
                 # Create group and assign to group admin
-                group_id = create_group(group_name, user_id)
+                group_id = repo.create_group(group_name, user_id)
                 st.success("Group admin and group created successfully.")
 
 def view_edit_group_admins():
+    repo = get_repository()
     st.subheader("View/Edit Group Admins")
-    group_admins = get_users_by_role("group_admin")
+    group_admins = repo.get_users_by_role("group_admin")
     if group_admins:
         admin_options = [f"{admin[0]}: {admin[1]}" for admin in group_admins]
         selected_admin_str = st.selectbox("Select a group admin:", admin_options)
         selected_admin_id = int(selected_admin_str.split(":")[0])
 
-        admin = get_user_by_id(selected_admin_id)
+        admin = repo.get_user_by_id(selected_admin_id)
         if admin:
             st.write(f"**Username:** {admin[1]}")
             st.write(f"**User ID:** {admin[0]}")
@@ -214,60 +277,13 @@ def view_edit_group_admins():
             if action == "Update Role":
                 new_role = st.selectbox("Select new role:", ["admin", "group_admin", "user"])
                 if st.button("Update Role"):
-                    update_user_role(selected_admin_id, new_role)
+                    repo.update_user_role(selected_admin_id, new_role)
                     st.success("Role updated successfully.")
             elif action == "Delete Group Admin":
                 if st.button("Delete"):
-                    delete_user(selected_admin_id)
+                    repo.delete_user(selected_admin_id)
                     st.success("Group admin deleted successfully.")
         else:
             st.error("Group admin not found.")
     else:
         st.info("No group admins found.")
-
-# Additional helper functions (to be placed within admin.py or imported)
-
-def get_current_polls_admin():
-    """Retrieve current polls for the admin dashboard."""
-    now = datetime.now()
-    with create_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM Polls WHERE start_time <= ? AND end_time >= ?
-        ''', (now, now))
-        polls = cursor.fetchall()
-        # Convert to list of dictionaries for easier handling
-        poll_list = []
-        for poll in polls:
-            poll_dict = {
-                'poll_id': poll[0],
-                'poll_question': poll[1],
-                'is_public': bool(poll[2]),
-                'creator_id': poll[3],
-                'group_id': poll[4],
-                'start_time': poll[5],
-                'end_time': poll[6],
-            }
-            poll_list.append(poll_dict)
-        return poll_list
-
-def get_vote_counts(poll_id):
-    """Retrieve vote counts for a specific poll."""
-    with create_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT Options.option_text, COUNT(Votes.vote_id) as vote_count FROM Options
-            LEFT JOIN Votes ON Options.option_id = Votes.option_id
-            WHERE Options.poll_id = ?
-            GROUP BY Options.option_id
-        ''', (poll_id,))
-        results = cursor.fetchall()
-        return results
-
-def get_all_groups():
-    """Retrieve all groups."""
-    with create_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM Groups')
-        groups = cursor.fetchall()
-        return groups
\ No newline at end of file
@@ -5,8 +5,11 @@ from auth import login, register, logout
 from admin import admin_dashboard
 from group_admin import group_admin_dashboard
 from user import user_dashboard
+from poll_scheduler import start_poll_scheduler
 
 def main():
+    # Freeze poll results in the background as polls close.
+    start_poll_scheduler()
     st.title("Voting Application")
     if 'authenticated' not in st.session_state:
         st.session_state.authenticated = False
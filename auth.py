@@ -1,11 +1,11 @@
 # auth.py
 
 import streamlit as st
-import bcrypt
-from database import insert_user, get_user_by_username, init_db
-from utils import hash_password, check_password
+from repository import get_repository
+from utils import hash_password, verify_password
 
 def register():
+    repo = get_repository()
     st.title("Register")
     username = st.text_input("Username")
     password = st.text_input("Password", type='password')
@@ -19,16 +19,17 @@ def register():
             st.error("Please fill out all fields.")
         else:
             # Check if username already exists
-            existing_user = get_user_by_username(username)
+            existing_user = repo.get_user_by_username(username)
             if existing_user:
                 st.error("Username already exists.")
             else:
                 password_hash = hash_password(password)
-                insert_user(username, password_hash, role)
+                repo.insert_user(username, password_hash, role)
                 st.success("User registered successfully. Please log in.")
                 st.info("Go to the Login page.")
 
 def login():
+    repo = get_repository()
     st.title("Login")
     username = st.text_input("Username")
     password = st.text_input("Password", type='password')
@@ -37,10 +38,14 @@ def login():
         if not username or not password:
             st.error("Please enter your username and password.")
         else:
-            user = get_user_by_username(username)
+            user = repo.get_user_by_username(username)
             if user:
                 password_hash = user[2]
-                if check_password(password, password_hash):
+                is_valid, new_hash = verify_password(password, password_hash)
+                if is_valid:
+                    if new_hash:
+                        # Stored hash uses an outdated work factor; upgrade it.
+                        repo.update_user_password_hash(user[0], new_hash)
                     # Set session state
                     st.session_state.authenticated = True
                     st.session_state.user_id = user[0]
@@ -59,11 +64,5 @@ def logout():
             del st.session_state[key]
     st.rerun()
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-
-def check_password(password, password_hash):
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash)
-
 # Initialize the database (ensure tables are created)
-init_db()
\ No newline at end of file
+get_repository().init_db()
\ No newline at end of file
@@ -0,0 +1,514 @@
+# benchmark.py
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database
+import ranked_choice
+import repository
+from poll_index import to_epoch
+
+def time_calls(func, iterations):
+    """Call func `iterations` times and return the duration of each call in seconds."""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(durations):
+    """Return mean/p50/p95/p99 in milliseconds for a list of durations."""
+    ordered = sorted(durations)
+    return {
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': statistics.median(ordered) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+    }
+
+def hot_read_functions():
+    """Hot read paths of the UI, bound to ids that exist in the current database."""
+    with database.create_connection() as conn:
+        user = conn.execute('SELECT user_id FROM Users LIMIT 1').fetchone()
+        other = conn.execute('SELECT user_id FROM Users ORDER BY user_id DESC LIMIT 1').fetchone()
+        poll = conn.execute('SELECT poll_id FROM Polls LIMIT 1').fetchone()
+    user_id = user[0] if user else 1
+    other_id = other[0] if other else 1
+    poll_id = poll[0] if poll else 1
+    return {
+        'get_current_polls': lambda: database.get_current_polls(user_id),
+        'has_user_voted': lambda: database.has_user_voted(poll_id, user_id),
+        'get_options_by_poll': lambda: database.get_options_by_poll(poll_id),
+        'get_vote_counts': lambda: database.get_vote_counts(poll_id),
+        'get_messages': lambda: database.get_messages(user_id, other_id),
+        # Clear the user cache on every call, or the pool is never touched.
+        'get_user_by_id': lambda: _without_user_cache(database.get_user_by_id)(user_id),
+    }
+
+def benchmark_pool(iterations=500):
+    """Compare pooled and per-call connection latency for the hot read functions."""
+    pool_enabled = database.POOL_ENABLED
+    functions = hot_read_functions()
+    results = {}
+    try:
+        for mode, enabled in (('per_call', False), ('pooled', True)):
+            database.POOL_ENABLED = enabled
+            results[mode] = {
+                name: summarize(time_calls(func, iterations))
+                for name, func in functions.items()
+            }
+    finally:
+        database.POOL_ENABLED = pool_enabled
+    return results
+
+def print_pool_report(results):
+    print(f"{'function':<22}{'per-call p50':>14}{'pooled p50':>12}{'speedup':>10}")
+    for name, per_call in results['per_call'].items():
+        pooled = results['pooled'][name]
+        speedup = per_call['p50_ms'] / pooled['p50_ms'] if pooled['p50_ms'] else float('inf')
+        print(f"{name:<22}{per_call['p50_ms']:>12.3f}ms{pooled['p50_ms']:>10.3f}ms{speedup:>9.1f}x")
+
+def seed_live_polls(poll_count, options_per_poll=4, voted_every=3):
+    """Fill the current database with one voter and `poll_count` live public polls. Returns the user_id."""
+    user_id = database.insert_user('bench_voter', b'x', 'user')
+    now = datetime.now()
+    polls = [
+        {
+            'poll_question': f"Benchmark poll {i}",
+            'is_public': True,
+            'creator_id': user_id,
+            'group_id': None,
+            'start_time': now - timedelta(days=1),
+            'end_time': now + timedelta(days=1),
+            'options': [f"Option {j}" for j in range(options_per_poll)],
+        }
+        for i in range(poll_count)
+    ]
+    poll_ids = database.create_polls_bulk(polls)
+    database.cast_votes([
+        (poll_id, database.get_options_by_poll(poll_id)[0][0], user_id)
+        for poll_id in poll_ids[::voted_every]
+    ])
+    return user_id
+
+def render_vote_page_per_poll(user_id):
+    """Data access of the Vote page before get_vote_feed: one lookup per poll."""
+    for poll in database.get_current_polls(user_id):
+        if not database.has_user_voted(poll[0], user_id):
+            database.get_options_by_poll(poll[0])
+
+def render_vote_page_feed(user_id):
+    database.get_vote_feed(user_id)
+
+def benchmark_feed(poll_count=50, iterations=200):
+    """Compare query count and render time of the Vote page with and without get_vote_feed."""
+    db_name = database.DB_NAME
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    statements = []
+    try:
+        database.DB_NAME = path
+        database.init_db()
+        user_id = seed_live_polls(poll_count)
+        database.add_statement_tracer(statements.append)
+        results = {}
+        for mode, render in (('per_poll', render_vote_page_per_poll), ('feed', render_vote_page_feed)):
+            statements.clear()
+            render(user_id)
+            queries = len(statements)
+            results[mode] = dict(summarize(time_calls(lambda: render(user_id), iterations)), queries=queries)
+        return results
+    finally:
+        database.remove_statement_tracer(statements.append)
+        database.get_pool().close_all()
+        database.DB_NAME = db_name
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def print_feed_report(results):
+    print(f"{'render':<10}{'queries':>9}{'p50':>12}{'p99':>12}")
+    for mode, result in results.items():
+        print(f"{mode:<10}{result['queries']:>9}{result['p50_ms']:>10.3f}ms{result['p99_ms']:>10.3f}ms")
+
+def generate_ballots(count, candidates=8, seed=0):
+    """Random ranked ballots over option_ids 1..candidates, skewed towards the low ids.
+
+    Voters rank between one and all candidates, so some ballots exhaust.
+    """
+    rng = random.Random(seed)
+    option_ids = list(range(1, candidates + 1))
+    weights = [1 / rank for rank in option_ids]
+    ballots = []
+    for _ in range(count):
+        # Weighted shuffle: sort by a random key biased by the weights.
+        ranking = sorted(option_ids, key=lambda option_id: rng.random() ** (1 / weights[option_id - 1]), reverse=True)
+        ballots.append(ranked_choice.encode_ranking(ranking[:rng.randint(1, candidates)]))
+    return option_ids, ballots
+
+def tally_ranked_python(option_ids, rankings):
+    """Reference instant-runoff with a Python loop over the ballots in every round."""
+    ballots = [ranked_choice.decode_ranking(blob) for blob in rankings]
+    eliminated = set()
+    first_round = None
+    while True:
+        counts = {option_id: 0 for option_id in option_ids if option_id not in eliminated}
+        for ballot in ballots:
+            for option_id in ballot:
+                if option_id in counts:
+                    counts[option_id] += 1
+                    break
+        if first_round is None:
+            first_round = dict(counts)
+        active = sum(counts.values())
+        if active == 0:
+            return None
+        leader = max(counts, key=lambda option_id: (counts[option_id], -option_ids.index(option_id)))
+        if counts[leader] * 2 > active or len(counts) == 1:
+            return leader
+        eliminated.add(min(counts, key=lambda option_id: (
+            counts[option_id], first_round[option_id], -option_ids.index(option_id))))
+
+def benchmark_ranked(ballot_count=100000, candidates=8, repeat=5):
+    """Time the NumPy instant-runoff engine against a per-ballot Python loop."""
+    option_ids, rankings = generate_ballots(ballot_count, candidates)
+    result = ranked_choice.tally(option_ids, rankings)
+    if tally_ranked_python(option_ids, rankings) != result['winner']:
+        raise AssertionError("NumPy and Python tallies disagree")
+    matrix = ranked_choice.ballot_matrix(rankings, option_ids)
+    return {
+        'ballots': ballot_count,
+        'rounds': len(result['rounds']),
+        'decode': summarize(time_calls(lambda: ranked_choice.ballot_matrix(rankings, option_ids), repeat)),
+        'tally': summarize(time_calls(lambda: ranked_choice.instant_runoff(matrix, len(option_ids)), repeat)),
+        'total': summarize(time_calls(lambda: ranked_choice.tally(option_ids, rankings), repeat)),
+        'python': summarize(time_calls(lambda: tally_ranked_python(option_ids, rankings), repeat)),
+    }
+
+def print_ranked_report(results):
+    print(f"{results['ballots']} ballots, {results['rounds']} rounds")
+    for step in ('decode', 'tally', 'total', 'python'):
+        print(f"{step:<8}{results[step]['p50_ms']:>10.1f}ms")
+    print(f"speedup {results['python']['p50_ms'] / results['total']['p50_ms']:.1f}x")
+
+def seed_repository(repo, users=500, groups=10, polls=200, messages=5000, seed=0):
+    """Fill a repository with random users, memberships, live polls, votes and messages.
+
+    The same seed gives every backend the same data. Returns ids to
+    benchmark with: user_id, other_user_id, group_id, and poll_id and
+    option_id of a single-choice poll in the user's vote feed.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    user_ids = [repo.insert_user(f"bench_user_{i}", 'x', 'user') for i in range(users)]
+    group_ids = [repo.create_group(f"Bench group {i}", user_ids[i]) for i in range(groups)]
+    for i in range(users):
+        repo.import_group_members(rng.choice(group_ids), [f"bench_user_{i}"])
+    poll_ids = []
+    for i in range(polls):
+        is_public = rng.random() < 0.5
+        start = now - timedelta(hours=rng.randint(1, 48))
+        poll_ids.append(repo.create_poll_with_options(
+            f"Benchmark question {i} about {rng.choice(['budgets', 'events', 'rules', 'venues'])}", is_public,
+            user_ids[0], None if is_public else rng.choice(group_ids), start,
+            start + timedelta(hours=rng.randint(1, 96)), [f"Option {j}" for j in range(4)],
+        ))
+    for user_id in user_ids[:users // 2]:
+        repo.cast_votes([(poll['poll_id'], rng.choice(poll['options'])[0], user_id)
+                         for poll in repo.get_vote_feed(user_id) if poll['poll_type'] == 'single'])
+    words = ['agenda', 'budget', 'meeting', 'venue', 'vote', 'deadline', 'question', 'thanks']
+    for _ in range(messages):
+        sender_id, receiver_id = rng.sample(user_ids[:20], 2)
+        repo.send_message(sender_id, receiver_id, ' '.join(rng.choices(words, k=8)))
+    poll = next(poll for poll in repo.get_vote_feed(user_ids[0]) if poll['poll_type'] == 'single')
+    return {
+        'user_id': user_ids[0],
+        'other_user_id': user_ids[1],
+        'group_id': group_ids[0],
+        'poll_id': poll['poll_id'],
+        'option_id': poll['options'][0][0],
+    }
+
+def benchmark_storage(iterations=200):
+    """Time the UI's hot read paths on the SQLite and in-memory repositories, seeded with the same data."""
+    db_name = database.DB_NAME
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    results = {}
+    try:
+        database.DB_NAME = path
+        database.init_db()
+        for backend, repo in (('sqlite', repository.SQLiteRepository()), ('memory', repository.InMemoryRepository())):
+            start = time.perf_counter()
+            ids = seed_repository(repo)
+            seed_seconds = time.perf_counter() - start
+            functions = {
+                'get_vote_feed': lambda: repo.get_vote_feed(ids['user_id']),
+                'get_current_polls_admin': repo.get_current_polls_admin,
+                'search_polls': lambda: repo.search_polls('budgets', status='live'),
+                'get_final_vote_counts': lambda: repo.get_final_vote_counts(ids['poll_id']),
+                'get_group_members': lambda: repo.get_group_members(ids['group_id']),
+                'get_messages_page': lambda: repo.get_messages_page(ids['user_id'], ids['other_user_id']),
+                'search_messages': lambda: repo.search_messages(ids['user_id'], 'budget venue'),
+                'get_dashboard_stats': repo.get_dashboard_stats,
+                'cast_vote': lambda: repo.cast_vote(ids['poll_id'], ids['option_id'], ids['other_user_id']),
+            }
+            results[backend] = {name: summarize(time_calls(func, iterations)) for name, func in functions.items()}
+            results[backend]['seed'] = {'p50_ms': seed_seconds * 1000}
+        return results
+    finally:
+        database.get_pool().close_all()
+        database.DB_NAME = db_name
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def print_storage_report(results):
+    print(f"{'function':<26}{'sqlite p50':>12}{'memory p50':>12}{'speedup':>10}")
+    for name, sqlite_result in results['sqlite'].items():
+        memory = results['memory'][name]
+        speedup = sqlite_result['p50_ms'] / memory['p50_ms'] if memory['p50_ms'] else float('inf')
+        print(f"{name:<26}{sqlite_result['p50_ms']:>10.3f}ms{memory['p50_ms']:>10.3f}ms{speedup:>9.1f}x")
+
+class Sampler:
+    """Random ids that exist in the current database, used as benchmark arguments."""
+
+    def __init__(self, seed=0, sample_size=1000):
+        self.rng = random.Random(seed)
+        with database.create_connection() as conn:
+            def sample(query):
+                return [row for row in conn.execute(f'{query} ORDER BY RANDOM() LIMIT {sample_size}')]
+            self.users = sample('SELECT user_id, username FROM Users') or [(1, 'admin')]
+            self.polls = sample('SELECT poll_id FROM Polls') or [(1,)]
+            self.groups = sample('SELECT group_id, group_name, admin_user_id FROM Groups') or [(1, 'group', 1)]
+            self.pairs = sample('SELECT sender_id, receiver_id, message_id FROM Messages') or [(1, 1, 1)]
+            self.options = sample('SELECT option_id, poll_id FROM Options') or [(1, 1)]
+            self.ranked_polls = sample("SELECT poll_id FROM Polls WHERE poll_type = 'ranked'") or self.polls
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def poll_id(self):
+        return self.rng.choice(self.polls)[0]
+
+    def group(self):
+        return self.rng.choice(self.groups)
+
+    def pair(self):
+        return self.rng.choice(self.pairs)
+
+    def option(self):
+        return self.rng.choice(self.options)
+
+    def ranked_poll_id(self):
+        return self.rng.choice(self.ranked_polls)[0]
+
+def _uncached(func):
+    """The undecorated function, so cached reads are timed against SQLite."""
+    return inspect.unwrap(func)
+
+def _without_user_cache(func):
+    def call(*args):
+        database.user_cache.clear()
+        return func(*args)
+    return call
+
+def suite_cases(sampler):
+    """(name, callable) pairs covering the public functions of database.py.
+
+    Each callable picks fresh arguments from the sampler on every call.
+    """
+    d = database
+    reads = [
+        ('get_user_by_id', lambda: _without_user_cache(d.get_user_by_id)(sampler.user()[0])),
+        ('get_user_by_username', lambda: _without_user_cache(d.get_user_by_username)(sampler.user()[1])),
+        ('get_user_ids_by_username', lambda: d.get_user_ids_by_username([user[1] for user in sampler.users[:100]])),
+        ('get_all_users', lambda: _uncached(d.get_all_users)()),
+        ('get_users_by_role', lambda: _uncached(d.get_users_by_role)('group_admin')),
+        ('get_user_count', d.get_user_count),
+        ('get_group_count', d.get_group_count),
+        ('get_poll_count', d.get_poll_count),
+        ('get_active_user_count', d.get_active_user_count),
+        ('get_dashboard_stats', d.get_dashboard_stats),
+        ('get_all_groups', lambda: _uncached(d.get_all_groups)()),
+        ('get_group_by_name', lambda: d.get_group_by_name(sampler.group()[1])),
+        ('get_group_id_by_admin', lambda: d.get_group_id_by_admin(sampler.group()[2])),
+        ('get_group_members', lambda: d.get_group_members(sampler.group()[0])),
+        ('get_group_member_requests', lambda: d.get_group_member_requests(sampler.group()[0])),
+        ('get_group_member_count', lambda: d.get_group_member_count(sampler.group()[0])),
+        ('get_current_polls', lambda: d.get_current_polls(sampler.user()[0])),
+        ('get_live_polls', d.get_live_polls),
+        ('get_current_polls_admin', d.get_current_polls_admin),
+        ('get_current_polls_by_group', lambda: d.get_current_polls_by_group(sampler.group()[0])),
+        ('get_vote_feed', lambda: d.get_vote_feed(sampler.user()[0])),
+        ('get_all_polls', lambda: _uncached(d.get_all_polls)()),
+        ('get_poll_by_id', lambda: d.get_poll_by_id(sampler.poll_id())),
+        ('get_polls_by_creator', lambda: d.get_polls_by_creator(sampler.group()[2])),
+        ('get_polls_by_group', lambda: d.get_polls_by_group(sampler.group()[0])),
+        ('search_polls', lambda: d.search_polls(f"poll {sampler.rng.randint(0, 99)}")[0]),
+        ('search_polls_live', lambda: d.search_polls(status='live')[0]),
+        ('get_polls_user_can_see_results', lambda: _uncached(d.get_polls_user_can_see_results)(sampler.user()[0])),
+        ('get_options_by_poll', lambda: d.get_options_by_poll(sampler.poll_id())),
+        ('has_user_voted', lambda: d.has_user_voted(sampler.poll_id(), sampler.user()[0])),
+        ('get_vote_counts', lambda: d.get_vote_counts(sampler.poll_id())),
+        ('get_final_vote_counts', lambda: d.get_final_vote_counts(sampler.poll_id())),
+        ('get_poll_results', lambda: d.get_poll_results(sampler.poll_id())),
+        ('get_ranked_choice_results', lambda: _uncached(d.get_ranked_choice_results)(sampler.ranked_poll_id())),
+        ('get_vote_turnout', lambda: d.get_vote_turnout(sampler.poll_id())),
+        ('get_next_poll_close', d.get_next_poll_close),
+        ('get_polls_due_for_close', lambda: d.get_polls_due_for_close(to_epoch(datetime.now()))),
+        ('get_messages', lambda: d.get_messages(*sampler.pair()[:2])),
+        ('get_messages_page', lambda: d.get_messages_page(*sampler.pair()[:2])[0]),
+        ('get_messages_since', lambda: d.get_messages_since(*sampler.pair())),
+        ('search_messages', lambda: d.search_messages(sampler.pair()[0], f"synthetic {sampler.rng.randint(1, 99)}")[0]),
+    ]
+    writes = [
+        ('cast_vote', lambda: d.cast_vote(*reversed(sampler.option()), sampler.user()[0])),
+        ('send_message', lambda: d.send_message(sampler.user()[0], sampler.user()[0], "benchmark message")),
+        ('create_poll_with_options', lambda: d.create_poll_with_options(
+            "Benchmark poll", True, sampler.user()[0], None,
+            datetime.now(), datetime.now() + timedelta(days=1), ["Yes", "No", "Maybe"])),
+    ]
+    return reads, writes
+
+# Public database.py functions the suite deliberately leaves out: plumbing,
+# maintenance commands and the writes not covered by --writes.
+NOT_TIMED = frozenset({
+    'init_db', 'get_pool', 'create_connection', 'add_statement_tracer', 'remove_statement_tracer',
+    'cached_query', 'bump_table_generation', 'get_table_generation', 'get_cache_stats', 'clear_query_cache',
+    'verify_vote_tallies', 'rebuild_vote_tallies', 'reconcile_stats', 'backfill_vote_times',
+    'insert_user', 'update_user_role', 'update_user_password_hash', 'delete_user',
+    'create_group', 'delete_group', 'request_membership', 'update_group_member_status',
+    'update_group_member_statuses', 'delete_group_member', 'import_group_members',
+    'create_poll', 'create_polls_bulk', 'add_option', 'update_poll', 'delete_poll', 'close_poll',
+    'cast_votes', 'cast_ranked_ballot',
+})
+
+def untimed_functions(cases):
+    """Public database.py functions that have no suite case and are not in NOT_TIMED."""
+    timed = {name for name, _ in cases}
+    return sorted(
+        name for name, value in vars(database).items()
+        if inspect.isfunction(value) and not name.startswith('_')
+        and inspect.unwrap(value).__module__ == database.__name__
+        and name not in timed and name not in NOT_TIMED
+    )
+
+def _row_count(result):
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+def run_suite(iterations=200, include_writes=False, seed=0):
+    """Time every case and return a machine-readable report."""
+    sampler = Sampler(seed)
+    reads, writes = suite_cases(sampler)
+    cases = reads + (writes if include_writes else [])
+    results = {}
+    for name, func in cases:
+        func()  # warm up
+        durations = []
+        rows = 0
+        for _ in range(iterations):
+            start = time.perf_counter()
+            result = func()
+            durations.append(time.perf_counter() - start)
+            rows += _row_count(result)
+        total = sum(durations)
+        results[name] = dict(
+            summarize(durations),
+            calls=iterations,
+            rows=rows,
+            rows_per_sec=rows / total if total else 0.0,
+            kind='write' if (name, func) in writes else 'read',
+        )
+
+    with database.create_connection() as conn:
+        table_counts = {
+            table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('Users', 'Groups', 'GroupMembers', 'Polls', 'Options', 'Votes', 'Messages')
+        }
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'database': database.DB_NAME,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'iterations': iterations,
+        'table_counts': table_counts,
+        'results': results,
+        'untimed': untimed_functions(reads + writes),
+    }
+
+def print_suite_report(report, baseline=None):
+    header = f"{'function':<32}{'p50':>10}{'p95':>10}{'p99':>10}{'rows/s':>12}"
+    if baseline:
+        header += f"{'p50 vs base':>13}"
+    print(header)
+    for name, result in report['results'].items():
+        line = (f"{name:<32}{result['p50_ms']:>8.3f}ms{result['p95_ms']:>8.3f}ms"
+                f"{result['p99_ms']:>8.3f}ms{result['rows_per_sec']:>12.0f}")
+        base = (baseline or {}).get('results', {}).get(name)
+        if base and base['p50_ms']:
+            line += f"{(result['p50_ms'] / base['p50_ms'] - 1) * 100:>+12.1f}%"
+        print(line)
+    if report.get('untimed'):
+        print(f"No suite case for: {', '.join(report['untimed'])} (add one, or list it in NOT_TIMED).")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the voting app data-access layer.")
+    parser.add_argument('mode', choices=['pool', 'feed', 'suite', 'ranked', 'storage'], help="Benchmark to run.")
+    parser.add_argument('--db', default=database.DB_NAME, help="Database file to benchmark against.")
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--polls', type=int, default=50, help="Live polls to seed for the feed benchmark.")
+    parser.add_argument('--writes', action='store_true', help="Also time write functions (suite; modifies --db).")
+    parser.add_argument('--output', help="Write the suite report as JSON to this file.")
+    parser.add_argument('--baseline', help="Earlier suite JSON report to compare against.")
+    parser.add_argument('--ballots', type=int, default=100000, help="Ballots for the ranked-choice benchmark.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per step of the ranked-choice benchmark.")
+    args = parser.parse_args()
+
+    if args.mode == 'feed':
+        # Runs against its own scratch database.
+        print_feed_report(benchmark_feed(args.polls, args.iterations))
+        return
+    if args.mode == 'storage':
+        # Seeds its own scratch database and an in-memory repository.
+        print_storage_report(benchmark_storage(args.iterations))
+        return
+    if args.mode == 'ranked':
+        # Runs in memory; the database is not touched.
+        print_ranked_report(benchmark_ranked(args.ballots, repeat=args.repeat))
+        return
+
+    database.DB_NAME = args.db
+    database.init_db()
+    if args.mode == 'pool':
+        print_pool_report(benchmark_pool(args.iterations))
+    elif args.mode == 'suite':
+        report = run_suite(args.iterations, include_writes=args.writes)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        print_suite_report(report, baseline)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,19 @@
 
 import streamlit as st
 from datetime import datetime
-from database import send_message, get_messages, get_all_users, get_user_by_id
+from repository import get_repository
 from auth import logout
 
 def admin_chat():
     st.header("Admin Chat")
     # Admin can select any user to chat with
-    users = get_all_users()
+    users = get_repository().get_all_users()
     users_dict = {f"{user[1]} (ID: {user[0]})": user[0] for user in users if user[0] != st.session_state.user_id}
     user_list = list(users_dict.keys())
 
     if user_list:
-        selected_user = st.sidebar.selectbox("Select a user to chat with:", user_list)
+        message_search(st.session_state.user_id, users_dict)
+        selected_user = st.sidebar.selectbox("Select a user to chat with:", user_list, key='admin_chat_user')
         receiver_id = users_dict[selected_user]
         chat_interface(st.session_state.user_id, receiver_id)
     else:
@@ -23,7 +24,7 @@ def group_admin_chat():
     st.header("Chat with Admin")
     # Group admin can only chat with admin(s)
     # Assuming admins have the role 'admin'
-    admins = [user for user in get_all_users() if user[2] == 'admin']
+    admins = [user for user in get_repository().get_all_users() if user[2] == 'admin']
     admins_dict = {f"{admin[1]} (ID: {admin[0]})": admin[0] for admin in admins}
 
     if admins_dict:
@@ -33,13 +34,82 @@ def group_admin_chat():
     else:
         st.info("No admins available to chat with.")
 
-def chat_interface(sender_id, receiver_id):
-    st.subheader(f"Chat with {get_user_by_id(receiver_id)[1]}")
-    # Display chat history
-    messages = get_messages(sender_id, receiver_id)
+MESSAGES_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+AUTO_REFRESH_SECONDS = 3
+
+def _open_conversation(label):
+    st.session_state['admin_chat_user'] = label
+
+def message_search(user_id, users_dict):
+    """Search box over the user's conversations; "Open" switches the chat to that conversation."""
+    repo = get_repository()
+    with st.expander("Search messages"):
+        query = st.text_input("Search your conversations:", key='message_search_query').strip()
+        if not query:
+            return
+        # Keep the loaded pages across reruns until the query or the messages change.
+        generation = repo.get_table_generation('Messages')
+        search = st.session_state.get('message_search')
+        if search is None or (search['query'], search['generation']) != (query, generation):
+            results, has_more = repo.search_messages(user_id, query, page_size=SEARCH_PAGE_SIZE)
+            search = st.session_state['message_search'] = {
+                'query': query, 'generation': generation, 'results': results, 'has_more': has_more,
+            }
+
+        if not search['results']:
+            st.info("No messages found.")
+            return
+        labels = {other_id: label for label, other_id in users_dict.items()}
+        for result in search['results']:
+            text_col, open_col = st.columns([5, 1])
+            direction = "You" if result['sender_id'] == user_id else result['other_username']
+            text_col.markdown(f"**{result['other_username']}** _({result['timestamp']})_  \n"
+                              f"{direction}: {result['snippet']}")
+            label = labels.get(result['other_user_id'])
+            if label is not None:
+                open_col.button("Open", key=f"open_message_{result['message_id']}",
+                                on_click=_open_conversation, args=(label,))
+        if search['has_more'] and st.button("More results"):
+            more, has_more = repo.search_messages(user_id, query,
+                                                  before_message_id=search['results'][-1]['message_id'],
+                                                  page_size=SEARCH_PAGE_SIZE)
+            search['results'].extend(more)
+            search['has_more'] = has_more
+            st.rerun()
+
+def get_conversation(sender_id, receiver_id):
+    """Return the session's cached copy of a conversation, topped up with new messages only."""
+    repo = get_repository()
+    cache = st.session_state.setdefault('chat_cache', {})
+    conversation = cache.get((sender_id, receiver_id))
+    if conversation is None:
+        messages, has_older = repo.get_messages_page(sender_id, receiver_id, page_size=MESSAGES_PAGE_SIZE)
+        conversation = cache[(sender_id, receiver_id)] = {'messages': messages, 'has_older': has_older}
+    else:
+        last_id = conversation['messages'][-1][0] if conversation['messages'] else 0
+        conversation['messages'].extend(repo.get_messages_since(sender_id, receiver_id, last_id))
+    return conversation
+
+def load_older_messages(sender_id, receiver_id, conversation):
+    older, has_older = get_repository().get_messages_page(
+        sender_id, receiver_id,
+        before_message_id=conversation['messages'][0][0],
+        page_size=MESSAGES_PAGE_SIZE,
+    )
+    conversation['messages'][:0] = older
+    conversation['has_older'] = has_older
+
+def show_messages(sender_id, receiver_id):
+    conversation = get_conversation(sender_id, receiver_id)
+    if conversation['has_older']:
+        if st.button("Load older messages"):
+            load_older_messages(sender_id, receiver_id, conversation)
+
+    messages = conversation['messages']
     if messages:
         for message in messages:
-            sender_name = get_user_by_id(message[1])[1]
+            sender_name = message[5]
             timestamp = message[4]
             message_text = message[3]
             if message[1] == sender_id:
@@ -49,11 +119,27 @@ def chat_interface(sender_id, receiver_id):
     else:
         st.info("No messages yet. Start the conversation!")
 
+# Reruns only the message list every few seconds; each run fetches new rows only.
+# Older Streamlit versions without st.fragment fall back to manual refresh.
+show_messages_live = st.fragment(run_every=AUTO_REFRESH_SECONDS)(show_messages) if hasattr(st, 'fragment') else None
+
+def chat_interface(sender_id, receiver_id):
+    repo = get_repository()
+    st.subheader(f"Chat with {repo.get_user_by_id(receiver_id)[1]}")
+    # Display chat history
+    auto_refresh = False
+    if show_messages_live is not None:
+        auto_refresh = st.checkbox("Auto-refresh", key=f"auto_refresh_{receiver_id}")
+    if auto_refresh:
+        show_messages_live(sender_id, receiver_id)
+    else:
+        show_messages(sender_id, receiver_id)
+
     # Input for new message
     message_text = st.text_input("Type your message:")
     if st.button("Send"):
         if message_text.strip():
-            send_message(sender_id, receiver_id, message_text.strip())
+            repo.send_message(sender_id, receiver_id, message_text.strip())
             st.rerun()  # Refresh to display the new message
         else:
-            st.warning("Please enter a message before sending.")
\ No newline at end of file
+            st.warning("Please enter a message before sending.")
@@ -1,17 +1,358 @@
 # database.py
 
+import functools
+import json
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from contextlib import closing
 from datetime import datetime
 
+import perf
+from migrations import STATS_QUERIES, apply_migrations
+from poll_index import LivePollIndex, poll_to_dict, to_epoch
+from ranked_choice import encode_ranking, tally_by_text
+
 DB_NAME = 'voting_app.db'
 
+# Connection pool settings. Connections are kept open and reused across
+# Streamlit reruns instead of being opened for every query.
+POOL_ENABLED = True
+POOL_SIZE = 8
+# Applied in order; busy_timeout comes first so the pragmas after it wait
+# for locks instead of failing with "database is locked".
+PRAGMAS = {
+    'busy_timeout': 5000,  # milliseconds
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,  # negative means KiB, roughly 16 MB per connection
+    'mmap_size': 268435456,  # 256 MB
+}
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that goes back to its pool instead of closing."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Commit or roll back like a plain connection, then release it so
+        # `with create_connection() as conn:` no longer leaks handles.
+        result = super().__exit__(exc_type, exc_value, traceback)
+        self.close()
+        return result
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived connections to one database file."""
+
+    def __init__(self, db_name, size=POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = _connect(self.db_name)
+            conn.pool = self
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        with self._lock:
+            if any(idle is conn for idle in self._idle):
+                return
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        # Pool is full: really close the overflow connection.
+        conn.pool = None
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+_statement_tracers = []
+_statement_tracer = None
+
+# Read cache. Every write function bumps a generation counter for the tables
+# it changes; a cached result is reused only while the generations of the
+# tables it was read from are unchanged, so invalidation is exact rather
+# than time based.
+#
+# Writes from other processes (poll_import.py, datagen.py, the sqlite3
+# shell) are picked up through the TableGenerations counters that triggers
+# keep in the database (see migrations.add_table_generations). A watcher
+# connection polls PRAGMA data_version, which changes only when another
+# connection commits, and re-reads the counters then; tables whose counter
+# moved get their generation bumped here as well. That check runs at most
+# every GENERATION_CHECK_INTERVAL seconds, so cached reads do not queue up
+# behind it; other processes' writes show up within that interval.
+#
+# The cache holds at most QUERY_CACHE_SIZE results and evicts the least
+# recently used, which also clears out entries left behind by old
+# generations.
+QUERY_CACHE_SIZE = 256
+GENERATION_CHECK_INTERVAL = 0.1  # seconds
+
+_table_generations = {}
+_query_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0}
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def bump_table_generation(*tables):
+    """Mark tables as changed, invalidating cached reads that depend on them."""
+    with _cache_lock:
+        for table in tables:
+            _table_generations[table] = _table_generations.get(table, 0) + 1
+
+def get_table_generation(table):
+    """Current generation of `table`, including writes made by other processes."""
+    _sync_table_generations()
+    return _table_generations.get(table, 0)
+
+def _sync_table_generations():
+    """Bump the generations of tables that were written since the last check, by any process."""
+    global _watcher
+    watcher = _watcher
+    if (watcher is not None and watcher['db_name'] == DB_NAME
+            and time.monotonic() - watcher['checked_at'] < GENERATION_CHECK_INTERVAL):
+        return
+    with _watcher_lock:
+        if _watcher is None or _watcher['db_name'] != DB_NAME:
+            if _watcher is not None:
+                _watcher['conn'].close()
+            # The watcher never writes, so data_version changes on every
+            # commit made by the pool's connections and other processes alike.
+            _watcher = {
+                'db_name': DB_NAME,
+                'conn': sqlite3.connect(DB_NAME, timeout=30, check_same_thread=False),
+                'data_version': None,
+                'generations': None,
+                'checked_at': 0.0,
+            }
+        elif time.monotonic() - _watcher['checked_at'] < GENERATION_CHECK_INTERVAL:
+            return  # Another thread checked while this one waited for the lock.
+        _watcher['checked_at'] = time.monotonic()
+        conn = _watcher['conn']
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == _watcher['data_version']:
+            return
+        try:
+            generations = dict(conn.execute('SELECT name, generation FROM TableGenerations'))
+        except sqlite3.OperationalError:
+            generations = {}  # Not migrated yet.
+        previous = _watcher['generations']
+        _watcher['data_version'] = data_version
+        _watcher['generations'] = generations
+        # A new database invalidates everything cached from the previous one.
+        changed = [name for name, generation in generations.items()
+                   if previous is None or previous.get(name) != generation]
+        if changed:
+            bump_table_generation(*changed)
+        if 'Users' in changed:
+            user_cache.invalidate_all()
+
+def cached_query(*tables):
+    """Cache a read function's results per arguments until one of `tables` is written.
+
+    Cached results are shared between callers and must not be mutated.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            # Read the generations before querying: a write that lands while
+            # the query runs leaves the entry stale, and the next call misses.
+            _sync_table_generations()
+            generations = tuple(_table_generations.get(table, 0) for table in tables)
+            with _cache_lock:
+                entry = _query_cache.get(key)
+                if entry is not None and entry[0] == generations:
+                    _query_cache.move_to_end(key)
+                    _cache_stats['hits'] += 1
+                    return entry[1]
+            result = func(*args, **kwargs)
+            with _cache_lock:
+                _cache_stats['misses'] += 1
+                _query_cache[key] = (generations, result)
+                _query_cache.move_to_end(key)
+                while len(_query_cache) > QUERY_CACHE_SIZE:
+                    _query_cache.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
+def get_cache_stats():
+    """Returns hit/miss counts, hit rate and number of entries of the read cache."""
+    with _cache_lock:
+        hits, misses = _cache_stats['hits'], _cache_stats['misses']
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'entries': len(_query_cache),
+        }
+
+def clear_query_cache():
+    with _cache_lock:
+        _query_cache.clear()
+        _cache_stats['hits'] = _cache_stats['misses'] = 0
+
+# Identity cache for user rows, keyed by user_id with a username index.
+# insert_user, delete_user and the user update functions invalidate entries;
+# a lookup only stores its row if no Users write happened while it queried.
+USER_CACHE_SIZE = 1024
+
+class UserCache:
+    """Thread-safe LRU cache of Users rows, looked up by user_id or username."""
+
+    def __init__(self, max_size=USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._rows = OrderedDict()
+        self._ids_by_username = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_id(self, user_id):
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(user_id)
+            self.hits += 1
+            return row
+
+    def get_by_username(self, username):
+        with self._lock:
+            user_id = self._ids_by_username.get(username)
+        if user_id is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def put(self, row, generation):
+        """Store a row read while the Users generation was `generation`."""
+        with self._lock:
+            # Read the dict directly: syncing here could flush this cache
+            # while its lock is held.
+            if generation != _table_generations.get('Users', 0):
+                return
+            self._rows[row[0]] = row
+            self._rows.move_to_end(row[0])
+            self._ids_by_username[row[1]] = row[0]
+            while len(self._rows) > self.max_size:
+                _, evicted = self._rows.popitem(last=False)
+                self._ids_by_username.pop(evicted[1], None)
+
+    def invalidate(self, user_id=None, username=None):
+        with self._lock:
+            if username is not None and user_id is None:
+                user_id = self._ids_by_username.get(username)
+            row = self._rows.pop(user_id, None)
+            if row is not None:
+                self._ids_by_username.pop(row[1], None)
+            if username is not None:
+                self._ids_by_username.pop(username, None)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._rows.clear()
+            self._ids_by_username.clear()
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._ids_by_username.clear()
+            self.hits = self.misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._rows),
+                'max_size': self.max_size,
+            }
+
+user_cache = UserCache()
+
+def _connect(db_name):
+    conn = sqlite3.connect(db_name, factory=PooledConnection, check_same_thread=False)
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def get_pool():
+    """Return the process-wide pool for DB_NAME, recreating it if DB_NAME changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.db_name != DB_NAME:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_NAME)
+        return _pool
+
 def create_connection():
-    conn = sqlite3.connect(DB_NAME)
+    """Return a connection to DB_NAME.
+
+    With pooling enabled the connection comes from the shared pool, and
+    closing it (or leaving a `with` block) hands it back for reuse.
+    """
+    conn = get_pool().acquire() if POOL_ENABLED else _connect(DB_NAME)
+    conn.set_trace_callback(_statement_tracer)
     return conn
 
+def _dispatch_statement(sql):
+    for tracer in _statement_tracers:
+        tracer(sql)
+
+def _update_statement_tracer():
+    global _statement_tracer
+    if not _statement_tracers:
+        _statement_tracer = None
+    elif len(_statement_tracers) == 1:
+        _statement_tracer = _statement_tracers[0]
+    else:
+        _statement_tracer = _dispatch_statement
+
+def add_statement_tracer(callback):
+    """Call callback(sql) for every statement run on connections from create_connection()."""
+    _statement_tracers.append(callback)
+    _update_statement_tracer()
+
+def remove_statement_tracer(callback):
+    if callback in _statement_tracers:
+        _statement_tracers.remove(callback)
+    _update_statement_tracer()
+
 def init_db():
-    """Initialize the database and create tables if they don't exist."""
+    """Initialize the database, create tables if they don't exist and apply migrations."""
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
 
@@ -100,6 +441,37 @@ def init_db():
 
         conn.commit()
 
+        # Bring older databases up to the current schema version.
+        apply_migrations(conn)
+    _search_tables.clear()
+
+# Full-text search. The FTS5 tables are created by migrations only when the
+# SQLite build supports FTS5; otherwise searches fall back to LIKE scans.
+_search_tables = {}
+
+def _has_search_table(conn, table):
+    key = (DB_NAME, table)
+    if key not in _search_tables:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        _search_tables[key] = row is not None
+    return _search_tables[key]
+
+def _fts_query(text):
+    """Match every word of free text, with FTS5 syntax characters quoted away.
+
+    Only the last word, the one still being typed, is matched as a prefix:
+    a prefix term merges the postings of every token it covers, which is
+    slow for short prefixes of common words.
+    """
+    terms = ['"{}"'.format(term.replace('"', '""')) for term in text.split()]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
 # User functions
 def insert_user(username, password_hash, role):
     with closing(create_connection()) as conn:
@@ -109,15 +481,24 @@ def insert_user(username, password_hash, role):
             VALUES (?, ?, ?)
         ''', (username, password_hash, role))
         conn.commit()
+        bump_table_generation('Users')
+        user_cache.invalidate(username=username)
         return cursor.lastrowid
 
 def get_user_by_username(username):
+    _sync_table_generations()
+    user = user_cache.get_by_username(username)
+    if user is not None:
+        return user
+    generation = get_table_generation('Users')
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT * FROM Users WHERE username = ?
         ''', (username,))
         user = cursor.fetchone()
+        if user is not None:
+            user_cache.put(user, generation)
         return user
 
 def get_user_count():
@@ -136,6 +517,7 @@ def create_group(group_name, admin_user_id):
             VALUES (?, ?)
         ''', (group_name, admin_user_id))
         conn.commit()
+        bump_table_generation('Groups')
         return cursor.lastrowid
 
 def get_group_by_name(group_name):
@@ -164,15 +546,26 @@ def get_group_id_by_admin(admin_user_id):
         return group[0] if group else None
 
 # GroupMembers functions
-def add_group_member(group_id, user_id, status='pending'):
+def request_membership(group_id, user_id):
+    """Ask to join a group. Returns False if the user is already a member or has a request pending.
+
+    A single upsert on idx_groupmembers_group_user does the check and the
+    insert, so concurrent clicks cannot create duplicate rows. A rejected
+    request is turned back into a pending one.
+    """
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO GroupMembers (group_id, user_id, status)
-            VALUES (?, ?, ?)
-        ''', (group_id, user_id, status))
+            VALUES (?, ?, 'pending')
+            ON CONFLICT (group_id, user_id) DO UPDATE SET status = 'pending'
+            WHERE status = 'rejected'
+        ''', (group_id, user_id))
         conn.commit()
-        return cursor.lastrowid
+        requested = cursor.rowcount > 0
+        if requested:
+            bump_table_generation('GroupMembers')
+        return requested
 
 def update_group_member_status(member_id, status):
     with closing(create_connection()) as conn:
@@ -181,6 +574,66 @@ def update_group_member_status(member_id, status):
             UPDATE GroupMembers SET status = ? WHERE member_id = ?
         ''', (status, member_id))
         conn.commit()
+        bump_table_generation('GroupMembers')
+
+# Bulk membership changes run in one transaction. Long id and username
+# lists are split into chunks of IN_BATCH_SIZE bound parameters.
+IN_BATCH_SIZE = 500
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def update_group_member_statuses(group_id, member_ids, status):
+    """Set the status of many requests of one group in a single transaction. Returns the rows changed.
+
+    member_ids that belong to another group are ignored.
+    """
+    changed = 0
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        for chunk in _chunks(member_ids, IN_BATCH_SIZE):
+            cursor.execute(f'''
+                UPDATE GroupMembers SET status = ?
+                WHERE group_id = ? AND member_id IN ({', '.join('?' * len(chunk))})
+            ''', [status, group_id] + chunk)
+            changed += cursor.rowcount
+        conn.commit()
+        bump_table_generation('GroupMembers')
+        return changed
+
+def get_user_ids_by_username(usernames):
+    """Map usernames to user_ids with one query per IN_BATCH_SIZE names. Unknown names are left out."""
+    user_ids = {}
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        for chunk in _chunks(set(usernames), IN_BATCH_SIZE):
+            cursor.execute(f'''
+                SELECT username, user_id FROM Users WHERE username IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            user_ids.update(cursor.fetchall())
+    return user_ids
+
+def import_group_members(group_id, usernames, status='accepted'):
+    """Add users to a group by username in one transaction. Returns (rows written, unknown usernames).
+
+    Users who already have a membership row get their status set to `status`.
+    """
+    usernames = list(dict.fromkeys(name.strip() for name in usernames if name.strip()))
+    user_ids = get_user_ids_by_username(usernames)
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO GroupMembers (group_id, user_id, status)
+            VALUES (?, ?, ?)
+            ON CONFLICT (group_id, user_id) DO UPDATE SET status = excluded.status
+            WHERE status != excluded.status
+        ''', [(group_id, user_ids[name], status) for name in usernames if name in user_ids])
+        written = cursor.rowcount
+        conn.commit()
+        bump_table_generation('GroupMembers')
+        return written, [name for name in usernames if name not in user_ids]
 
 def get_group_members(group_id, status='accepted'):
     with closing(create_connection()) as conn:
@@ -215,40 +668,156 @@ def get_group_member_count(group_id):
         return count
 
 # Poll functions
+def _insert_poll(cursor, poll_question, is_public, creator_id, group_id, start_time, end_time, options=(),
+                 poll_type='single'):
+    # Options are told apart by text on the vote page and in the results.
+    if len(set(options)) != len(options):
+        raise ValueError("Poll options must all be different.")
+    # Convert datetime objects to strings in ISO format
+    start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
+    end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute('''
+        INSERT INTO Polls (poll_question, is_public, creator_id, group_id, start_time, end_time, start_ts, end_ts,
+                           poll_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (poll_question, is_public, creator_id, group_id, start_time_str, end_time_str,
+          to_epoch(start_time), to_epoch(end_time), poll_type))
+    poll_id = cursor.lastrowid
+    if options:
+        cursor.executemany('''
+            INSERT INTO Options (poll_id, option_text)
+            VALUES (?, ?)
+        ''', [(poll_id, option_text) for option_text in options])
+    return poll_id
+
 def create_poll(poll_question, is_public, creator_id, group_id, start_time, end_time):
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
-        # Convert datetime objects to strings in ISO format
-        start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
-        end_time_str = end_time.strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('''
-            INSERT INTO Polls (poll_question, is_public, creator_id, group_id, start_time, end_time)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (poll_question, is_public, creator_id, group_id, start_time_str, end_time_str))
+        poll_id = _insert_poll(cursor, poll_question, is_public, creator_id, group_id, start_time, end_time)
         conn.commit()
-        return cursor.lastrowid
+        bump_table_generation('Polls')
+        return poll_id
+
+def create_poll_with_options(poll_question, is_public, creator_id, group_id, start_time, end_time, options,
+                             poll_type='single'):
+    """Creates a poll and all of its options in one transaction. Returns the poll_id.
+
+    Raises ValueError if two options have the same text.
+    """
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        poll_id = _insert_poll(
+            cursor, poll_question, is_public, creator_id, group_id, start_time, end_time, options, poll_type
+        )
+        conn.commit()
+        bump_table_generation('Polls', 'Options')
+        return poll_id
+
+def create_polls_bulk(polls):
+    """Creates many polls with their options in one transaction. Returns the new poll_ids.
+
+    Each poll is a dict with the keyword arguments of create_poll_with_options.
+    """
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        poll_ids = [_insert_poll(cursor, **poll) for poll in polls]
+        conn.commit()
+        bump_table_generation('Polls', 'Options')
+        return poll_ids
+
+_live_poll_index = None
+_live_poll_index_generation = None
+_live_poll_index_lock = threading.Lock()
+
+def get_live_polls(now=None):
+    """Returns the Polls rows that are live at `now` (default: current time), ordered by poll_id.
+
+    Answered from an in-memory LivePollIndex, rebuilt only after polls are
+    created, updated or deleted, by this process or any other.
+    """
+    global _live_poll_index, _live_poll_index_generation
+    now_ts = to_epoch(now or datetime.now())
+    with _live_poll_index_lock:
+        generation = (DB_NAME, get_table_generation('Polls'))
+        index = _live_poll_index
+        # Polls that have already ended cannot become live again unless they
+        # are updated, which bumps the generation and rebuilds the index.
+        if index is None or _live_poll_index_generation != generation or now_ts < index.built_at:
+            with closing(create_connection()) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM Polls WHERE end_ts >= ?', (now_ts,))
+                index = LivePollIndex(((poll[0], poll[7], poll[8], poll) for poll in cursor), built_at=now_ts)
+            _live_poll_index = index
+            _live_poll_index_generation = generation
+    return index.live_at(now_ts)
 
 def get_current_polls(user_id):
-    now = datetime.now()
+    """Returns the live public polls plus live polls of groups the user belongs to."""
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
-        # Get public polls
         cursor.execute('''
-            SELECT * FROM Polls
-            WHERE is_public = 1 AND start_time <= ? AND end_time >= ?
-        ''', (now, now))
-        public_polls = cursor.fetchall()
+            SELECT group_id FROM GroupMembers
+            WHERE user_id = ? AND status = 'accepted'
+        ''', (user_id,))
+        group_ids = {row[0] for row in cursor.fetchall()}
 
-        # Get private polls for groups the user is a member of
+    live_polls = get_live_polls()
+    public_polls = [poll for poll in live_polls if poll[2]]
+    private_polls = [poll for poll in live_polls if not poll[2] and poll[4] in group_ids]
+    return public_polls + private_polls
+
+def get_current_polls_admin():
+    """Retrieve current polls for the admin dashboard."""
+    return [poll_to_dict(poll) for poll in get_live_polls()]
+
+def get_vote_feed(user_id):
+    """Returns the live polls a user can vote in, with their options and whether the user voted.
+
+    Everything comes from one query; rows are grouped into a list of dicts in Python.
+    """
+    now = to_epoch(datetime.now())
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
         cursor.execute('''
-            SELECT Polls.* FROM Polls
-            JOIN GroupMembers ON Polls.group_id = GroupMembers.group_id
-            WHERE GroupMembers.user_id = ? AND GroupMembers.status = 'accepted'
-            AND Polls.is_public = 0 AND start_time <= ? AND end_time >= ?
-        ''', (user_id, now, now))
-        private_polls = cursor.fetchall()
+            WITH feed AS (
+                SELECT poll_id, poll_question, is_public, start_time, end_time, poll_type,
+                       EXISTS(
+                           SELECT 1 FROM Votes
+                           WHERE Votes.poll_id = Polls.poll_id AND Votes.user_id = ?
+                       ) OR EXISTS(
+                           SELECT 1 FROM RankedBallots
+                           WHERE RankedBallots.poll_id = Polls.poll_id AND RankedBallots.user_id = ?
+                       ) AS has_voted
+                FROM Polls
+                WHERE end_ts >= ? AND start_ts <= ?
+                AND (is_public = 1 OR group_id IN (
+                    SELECT group_id FROM GroupMembers
+                    WHERE user_id = ? AND status = 'accepted'
+                ))
+            )
+            SELECT feed.*, Options.option_id, Options.option_text FROM feed
+            LEFT JOIN Options ON Options.poll_id = feed.poll_id
+            ORDER BY feed.is_public DESC, feed.poll_id, Options.option_id
+        ''', (user_id, user_id, now, now, user_id))
 
-        return public_polls + private_polls
+        feed = {}
+        for (poll_id, poll_question, is_public, start_time, end_time, poll_type, has_voted,
+             option_id, option_text) in cursor:
+            poll = feed.get(poll_id)
+            if poll is None:
+                poll = feed[poll_id] = {
+                    'poll_id': poll_id,
+                    'poll_question': poll_question,
+                    'is_public': bool(is_public),
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'poll_type': poll_type,
+                    'has_voted': bool(has_voted),
+                    'options': [],
+                }
+            if option_id is not None:
+                poll['options'].append((option_id, option_text))
+        return list(feed.values())
 
 def get_polls_by_creator(creator_id):
     with closing(create_connection()) as conn:
@@ -268,6 +837,7 @@ def add_option(poll_id, option_text):
             VALUES (?, ?)
         ''', (poll_id, option_text))
         conn.commit()
+        bump_table_generation('Options')
         return cursor.lastrowid
 
 def get_options_by_poll(poll_id):
@@ -284,33 +854,250 @@ def cast_vote(poll_id, option_id, user_id):
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO Votes (poll_id, option_id, user_id)
-            VALUES (?, ?, ?)
-        ''', (poll_id, option_id, user_id))
+            INSERT INTO Votes (poll_id, option_id, user_id, cast_at)
+            VALUES (?, ?, ?, ?)
+        ''', (poll_id, option_id, user_id, to_epoch(datetime.now())))
         conn.commit()
+        bump_table_generation('Votes', 'Options')
         return cursor.lastrowid
 
+def cast_votes(votes):
+    """Inserts (poll_id, option_id, user_id) votes in a single transaction. Returns their vote_ids."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        vote_ids = []
+        cast_at = to_epoch(datetime.now())
+        for poll_id, option_id, user_id in votes:
+            cursor.execute('''
+                INSERT INTO Votes (poll_id, option_id, user_id, cast_at)
+                VALUES (?, ?, ?, ?)
+            ''', (poll_id, option_id, user_id, cast_at))
+            vote_ids.append(cursor.lastrowid)
+        conn.commit()
+        bump_table_generation('Votes', 'Options')
+        return vote_ids
+
 def has_user_voted(poll_id, user_id):
+    """True if the user has a vote or a ranked ballot in the poll."""
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT COUNT(*) FROM Votes WHERE poll_id = ? AND user_id = ?
-        ''', (poll_id, user_id))
-        count = cursor.fetchone()[0]
-        return count > 0
+            SELECT EXISTS(SELECT 1 FROM Votes WHERE poll_id = ? AND user_id = ?)
+                OR EXISTS(SELECT 1 FROM RankedBallots WHERE poll_id = ? AND user_id = ?)
+        ''', (poll_id, user_id, poll_id, user_id))
+        return bool(cursor.fetchone()[0])
+
+def cast_ranked_ballot(poll_id, user_id, option_ids):
+    """Stores a ranked-choice ballot, first choice first. Returns the ballot_id.
+
+    Raises ValueError if the poll is not ranked-choice or the ranking is
+    empty, repeats an option or names an option of another poll, and
+    sqlite3.IntegrityError if the user already voted.
+    """
+    option_ids = [int(option_id) for option_id in option_ids]
+    if not option_ids or len(set(option_ids)) != len(option_ids):
+        raise ValueError("A ranking must list at least one option, each at most once.")
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT poll_type FROM Polls WHERE poll_id = ?', (poll_id,))
+        row = cursor.fetchone()
+        if row is None or row[0] != 'ranked':
+            raise ValueError(f"Poll {poll_id} is not a ranked-choice poll.")
+        cursor.execute('SELECT option_id FROM Options WHERE poll_id = ?', (poll_id,))
+        if not set(option_ids) <= {row[0] for row in cursor.fetchall()}:
+            raise ValueError(f"The ranking names options that are not in poll {poll_id}.")
+        cursor.execute('''
+            INSERT INTO RankedBallots (poll_id, user_id, ranking, cast_at)
+            VALUES (?, ?, ?, ?)
+        ''', (poll_id, user_id, encode_ranking(option_ids), to_epoch(datetime.now())))
+        conn.commit()
+        bump_table_generation('RankedBallots')
+        return cursor.lastrowid
+
+def _ranked_choice_results(cursor, poll_id):
+    """Tally a ranked-choice poll; options and winner are given as option text."""
+    cursor.execute('SELECT option_id, option_text FROM Options WHERE poll_id = ? ORDER BY option_id', (poll_id,))
+    option_texts = dict(cursor.fetchall())
+    cursor.execute('SELECT ranking FROM RankedBallots WHERE poll_id = ?', (poll_id,))
+    return tally_by_text(option_texts, [row[0] for row in cursor.fetchall()])
+
+@cached_query('RankedBallots', 'Options', 'PollResults')
+def get_ranked_choice_results(poll_id):
+    """Instant-runoff results of a ranked-choice poll, frozen once the poll is closed.
+
+    Returns a dict with winner (option text or None), total_ballots and
+    rounds, each with counts as (option_text, votes) for the options still
+    in the race, exhausted ballots and the option eliminated after it.
+    """
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT ranked_results FROM PollResults WHERE poll_id = ?', (poll_id,))
+        row = cursor.fetchone()
+        if row is not None and row[0] is not None:
+            results = json.loads(row[0])
+            for round_result in results['rounds']:
+                round_result['counts'] = [tuple(count) for count in round_result['counts']]
+            return results
+        return _ranked_choice_results(cursor, poll_id)
 
 def get_vote_counts(poll_id):
+    """Returns (option_text, vote_count) per option, read from the trigger-maintained counters."""
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT Options.option_text, COUNT(Votes.vote_id) as vote_count FROM Options
-            LEFT JOIN Votes ON Options.option_id = Votes.option_id
-            WHERE Options.poll_id = ?
-            GROUP BY Options.option_id
+            SELECT option_text, vote_count FROM Options
+            WHERE poll_id = ?
+            ORDER BY option_id
         ''', (poll_id,))
         results = cursor.fetchall()
         return results
 
+# Poll lifecycle functions
+def get_vote_turnout(poll_id):
+    """Returns (bucket_ts, votes) per minute with votes, oldest first, from the VoteTurnout rollup."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT bucket_ts, votes FROM VoteTurnout
+            WHERE poll_id = ?
+            ORDER BY bucket_ts
+        ''', (poll_id,))
+        return cursor.fetchall()
+
+def backfill_vote_times(now=None):
+    """Estimate cast_at for votes recorded before vote times were stored. Returns the votes updated.
+
+    A poll's legacy votes are spread evenly over its voting window (up to
+    now for live polls) in vote_id order, which is the order they were
+    cast in. The turnout triggers fold the estimates into VoteTurnout.
+    """
+    now_ts = to_epoch(now or datetime.now())
+    updated = 0
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT Polls.poll_id, Polls.start_ts, Polls.end_ts FROM Polls
+            WHERE EXISTS (SELECT 1 FROM Votes WHERE Votes.poll_id = Polls.poll_id AND Votes.cast_at IS NULL)
+        ''')
+        for poll_id, start_ts, end_ts in cursor.fetchall():
+            cursor.execute('''
+                SELECT vote_id FROM Votes WHERE poll_id = ? AND cast_at IS NULL ORDER BY vote_id
+            ''', (poll_id,))
+            vote_ids = [row[0] for row in cursor.fetchall()]
+            span = max(min(end_ts, now_ts) - start_ts, 0)
+            cursor.executemany('UPDATE Votes SET cast_at = ? WHERE vote_id = ?', [
+                (start_ts + int(span * (i + 0.5) / len(vote_ids)), vote_id)
+                for i, vote_id in enumerate(vote_ids)
+            ])
+            conn.commit()
+            updated += len(vote_ids)
+    return updated
+
+def get_next_poll_close():
+    """Returns the earliest end_ts of a poll that is not closed yet, or None."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MIN(end_ts) FROM Polls WHERE is_closed = 0')
+        return cursor.fetchone()[0]
+
+def get_polls_due_for_close(now_ts):
+    """Returns the ids of polls whose window ended before now_ts but are not closed yet."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT poll_id FROM Polls WHERE is_closed = 0 AND end_ts < ?
+        ''', (now_ts,))
+        return [row[0] for row in cursor.fetchall()]
+
+def close_poll(poll_id):
+    """Freezes a poll's final results into PollResults and marks the poll closed."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT poll_type FROM Polls WHERE poll_id = ?', (poll_id,))
+        row = cursor.fetchone()
+        ranked_results = None
+        if row is not None and row[0] == 'ranked':
+            # First preferences stand in for the single-choice counts.
+            ranked_results = _ranked_choice_results(cursor, poll_id)
+            counts = ranked_results['rounds'][0]['counts']
+        else:
+            cursor.execute('''
+                SELECT option_text, vote_count FROM Options
+                WHERE poll_id = ?
+                ORDER BY option_id
+            ''', (poll_id,))
+            counts = cursor.fetchall()
+        total_votes = sum(count for _, count in counts)
+        results = [
+            (option_text, count, (count / total_votes) * 100 if total_votes else 0.0)
+            for option_text, count in counts
+        ]
+        cursor.execute('''
+            INSERT OR REPLACE INTO PollResults (poll_id, total_votes, results, closed_at, ranked_results)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (poll_id, total_votes, json.dumps(results), to_epoch(datetime.now()),
+              json.dumps(ranked_results) if ranked_results is not None else None))
+        cursor.execute('UPDATE Polls SET is_closed = 1 WHERE poll_id = ?', (poll_id,))
+        conn.commit()
+        bump_table_generation('Polls', 'PollResults')
+
+def get_poll_results(poll_id):
+    """Returns the frozen results of a closed poll, or None if it has not been closed yet.
+
+    The snapshot is a dict with total_votes, closed_at and results as a list of
+    (option_text, vote_count, percentage).
+    """
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT total_votes, results, closed_at FROM PollResults WHERE poll_id = ?
+        ''', (poll_id,))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {
+        'poll_id': poll_id,
+        'total_votes': row[0],
+        'results': [tuple(result) for result in json.loads(row[1])],
+        'closed_at': row[2],
+    }
+
+def get_final_vote_counts(poll_id):
+    """Returns (option_text, vote_count) from the frozen snapshot if the poll is closed, else live counts."""
+    snapshot = get_poll_results(poll_id)
+    if snapshot is None:
+        return get_vote_counts(poll_id)
+    return [(option_text, count) for option_text, count, _ in snapshot['results']]
+
+def verify_vote_tallies():
+    """Returns (option_id, stored_count, actual_count) for every option whose counter is wrong."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT Options.option_id, Options.vote_count, COUNT(Votes.vote_id) FROM Options
+            LEFT JOIN Votes ON Options.option_id = Votes.option_id
+            GROUP BY Options.option_id
+            HAVING Options.vote_count != COUNT(Votes.vote_id)
+        ''')
+        return cursor.fetchall()
+
+def rebuild_vote_tallies():
+    """Recomputes every option's vote counter from Votes. Returns the number of options fixed."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE Options SET vote_count = (
+                SELECT COUNT(*) FROM Votes WHERE Votes.option_id = Options.option_id
+            )
+            WHERE vote_count != (
+                SELECT COUNT(*) FROM Votes WHERE Votes.option_id = Options.option_id
+            )
+        ''')
+        conn.commit()
+        bump_table_generation('Options')
+        return cursor.rowcount
+
 # Message functions
 def send_message(sender_id, receiver_id, message_text):
     with closing(create_connection()) as conn:
@@ -320,6 +1107,7 @@ def send_message(sender_id, receiver_id, message_text):
             VALUES (?, ?, ?)
         ''', (sender_id, receiver_id, message_text))
         conn.commit()
+        bump_table_generation('Messages')
         return cursor.lastrowid
 
 def get_messages(user_id1, user_id2):
@@ -333,6 +1121,124 @@ def get_messages(user_id1, user_id2):
         messages = cursor.fetchall()
         return messages
 
+def get_messages_page(user_id1, user_id2, before_message_id=None, page_size=50):
+    """Returns one page of a conversation, oldest first, and whether older messages exist.
+
+    Rows are the Messages columns followed by the sender's username. Pass the
+    oldest message_id already shown as before_message_id to page backwards.
+    Each direction of the conversation is read from idx_messages_pair, whose
+    trailing rowid keeps the messages in message_id order.
+    """
+    if before_message_id is None:
+        before_message_id = 2 ** 63 - 1
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT Messages.*, Users.username FROM (
+                SELECT * FROM (
+                    SELECT message_id FROM Messages
+                    WHERE sender_id = ? AND receiver_id = ? AND message_id < ?
+                    ORDER BY message_id DESC LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT message_id FROM Messages
+                    WHERE sender_id = ? AND receiver_id = ? AND message_id < ?
+                    ORDER BY message_id DESC LIMIT ?
+                )
+            ) AS page
+            JOIN Messages ON Messages.message_id = page.message_id
+            LEFT JOIN Users ON Users.user_id = Messages.sender_id
+            ORDER BY Messages.message_id DESC
+            LIMIT ?
+        ''', (user_id1, user_id2, before_message_id, page_size + 1,
+              user_id2, user_id1, before_message_id, page_size + 1,
+              page_size + 1))
+        messages = cursor.fetchall()
+        has_older = len(messages) > page_size
+        return messages[:page_size][::-1], has_older
+
+def get_messages_since(user_id1, user_id2, last_message_id):
+    """Returns the messages of a conversation newer than last_message_id, oldest first.
+
+    Rows have the same shape as get_messages_page.
+    """
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT Messages.*, Users.username FROM Messages
+            LEFT JOIN Users ON Users.user_id = Messages.sender_id
+            WHERE ((sender_id = ? AND receiver_id = ?) OR (sender_id = ? AND receiver_id = ?))
+            AND message_id > ?
+            ORDER BY message_id ASC
+        ''', (user_id1, user_id2, user_id2, user_id1, last_message_id))
+        messages = cursor.fetchall()
+        return messages
+
+def search_messages(user_id, query, with_user_id=None, before_message_id=None, page_size=20,
+                    highlight=('**', '**')):
+    """Search the messages user_id sent or received, newest first. Returns (results, has_more).
+
+    Each result is a dict with message_id, sender_id, other_user_id,
+    other_username, timestamp and snippet, where the matched words are
+    wrapped in the `highlight` markers. Pass with_user_id to search a single
+    conversation, and the last message_id shown as before_message_id to get
+    the next page.
+    """
+    if not query.split():
+        return [], False
+    if before_message_id is None:
+        before_message_id = 2 ** 63 - 1
+    conditions = ['(Messages.sender_id = ? OR Messages.receiver_id = ?)', 'Messages.message_id < ?']
+    params = [user_id, user_id, before_message_id]
+    if with_user_id is not None:
+        conditions[0] = ('((Messages.sender_id = ? AND Messages.receiver_id = ?)'
+                         ' OR (Messages.sender_id = ? AND Messages.receiver_id = ?))')
+        params[:2] = [user_id, with_user_id, with_user_id, user_id]
+
+    with closing(create_connection()) as conn:
+        if _has_search_table(conn, 'MessageSearch'):
+            # FTS5 returns matches in descending rowid order, so the LIMIT
+            # stops the scan after one page instead of ranking every match.
+            source = 'MessageSearch JOIN Messages ON Messages.message_id = MessageSearch.rowid'
+            snippet = "snippet(MessageSearch, 0, ?, ?, '…', 12)"
+            order = 'MessageSearch.rowid DESC'
+            conditions.insert(0, 'MessageSearch MATCH ?')
+            params = list(highlight) + [_fts_query(query)] + params
+        else:
+            source, snippet, order = 'Messages', 'Messages.message_text', 'Messages.message_id DESC'
+            for term in query.split():
+                conditions.append("Messages.message_text LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(term))
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT page.*, Users.username FROM (
+                SELECT Messages.message_id, Messages.sender_id,
+                       CASE WHEN Messages.sender_id = ? THEN Messages.receiver_id ELSE Messages.sender_id END AS other_user_id,
+                       Messages.timestamp, {snippet} AS snippet
+                FROM {source}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {order}
+                LIMIT ?
+            ) AS page
+            LEFT JOIN Users ON Users.user_id = page.other_user_id
+            ORDER BY page.message_id DESC
+        ''', [user_id] + params + [page_size + 1])
+        rows = cursor.fetchall()
+        results = [
+            {
+                'message_id': message_id,
+                'sender_id': sender_id,
+                'other_user_id': other_user_id,
+                'other_username': other_username,
+                'timestamp': timestamp,
+                'snippet': snippet,
+            }
+            for message_id, sender_id, other_user_id, timestamp, snippet, other_username in rows[:page_size]
+        ]
+        return results, len(rows) > page_size
+
+@cached_query('Users')
 def get_all_users():
     with create_connection() as conn:
         cursor = conn.cursor()
@@ -341,10 +1247,17 @@ def get_all_users():
         return users
 
 def get_user_by_id(user_id):
+    _sync_table_generations()
+    user = user_cache.get_by_id(user_id)
+    if user is not None:
+        return user
+    generation = get_table_generation('Users')
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM Users WHERE user_id = ?', (user_id,))
         user = cursor.fetchone()
+        if user is not None:
+            user_cache.put(user, generation)
         return user
 
 def delete_user(user_id):
@@ -352,18 +1265,27 @@ def delete_user(user_id):
         cursor = conn.cursor()
         cursor.execute('DELETE FROM Users WHERE user_id = ?', (user_id,))
         conn.commit()
+        bump_table_generation('Users')
+        user_cache.invalidate(user_id)
 
 def delete_group(group_id):
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM Groups WHERE group_id = ?', (group_id,))
         conn.commit()
+        bump_table_generation('Groups')
 
 def delete_poll(poll_id):
+    """Deletes a poll with its options and votes in one transaction."""
     with closing(create_connection()) as conn:
         cursor = conn.cursor()
+        cursor.execute('DELETE FROM Votes WHERE poll_id = ?', (poll_id,))
+        cursor.execute('DELETE FROM RankedBallots WHERE poll_id = ?', (poll_id,))
+        cursor.execute('DELETE FROM Options WHERE poll_id = ?', (poll_id,))
+        cursor.execute('DELETE FROM PollResults WHERE poll_id = ?', (poll_id,))
         cursor.execute('DELETE FROM Polls WHERE poll_id = ?', (poll_id,))
         conn.commit()
+        bump_table_generation('Polls', 'Options', 'Votes', 'RankedBallots', 'PollResults')
 
 def update_poll(poll_id, poll_question=None, start_time=None, end_time=None):
     with closing(create_connection()) as conn:
@@ -374,15 +1296,33 @@ def update_poll(poll_id, poll_question=None, start_time=None, end_time=None):
             fields.append("poll_question = ?")
             params.append(poll_question)
         if start_time:
-            fields.append("start_time = ?")
-            params.append(start_time)
+            if isinstance(start_time, str):
+                start_time = datetime.fromisoformat(start_time)
+            fields.append("start_time = ?, start_ts = ?")
+            params.extend([start_time.strftime('%Y-%m-%d %H:%M:%S'), to_epoch(start_time)])
         if end_time:
-            fields.append("end_time = ?")
-            params.append(end_time)
+            if isinstance(end_time, str):
+                end_time = datetime.fromisoformat(end_time)
+            fields.append("end_time = ?, end_ts = ?")
+            params.extend([end_time.strftime('%Y-%m-%d %H:%M:%S'), to_epoch(end_time)])
+            # A new end time reopens the poll; the scheduler closes it again later.
+            fields.append("is_closed = 0")
+            cursor.execute('DELETE FROM PollResults WHERE poll_id = ?', (poll_id,))
         params.append(poll_id)
         query = f'UPDATE Polls SET {", ".join(fields)} WHERE poll_id = ?'
         cursor.execute(query, params)
         conn.commit()
+        bump_table_generation('Polls', 'PollResults')
+
+def update_user_password_hash(user_id, password_hash):
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE Users SET password_hash = ? WHERE user_id = ?
+        ''', (password_hash, user_id))
+        conn.commit()
+        bump_table_generation('Users')
+        user_cache.invalidate(user_id)
 
 def update_user_role(user_id, role):
     with closing(create_connection()) as conn:
@@ -391,6 +1331,8 @@ def update_user_role(user_id, role):
             UPDATE Users SET role = ? WHERE user_id = ?
         ''', (role, user_id))
         conn.commit()
+        bump_table_generation('Users')
+        user_cache.invalidate(user_id)
 
 def get_poll_count():
     """Returns the total number of polls."""
@@ -410,6 +1352,42 @@ def get_active_user_count():
         count = cursor.fetchone()[0]
         return count
     
+def get_dashboard_stats():
+    """Returns the trigger-maintained totals (total_users, total_groups, total_polls, active_voters)."""
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, value FROM Stats')
+        return dict(cursor.fetchall())
+
+def reconcile_stats():
+    """Recomputes the dashboard totals from the base tables.
+
+    Returns {name: (stored, actual)} for every total that was wrong.
+    """
+    with closing(create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('DELETE FROM VoterActivity')
+        cursor.execute('''
+            INSERT INTO VoterActivity (user_id, vote_count)
+            SELECT user_id, COUNT(*) FROM (
+                SELECT user_id FROM Votes
+                UNION ALL
+                SELECT user_id FROM RankedBallots
+            ) GROUP BY user_id
+        ''')
+        cursor.execute('SELECT name, value FROM Stats')
+        stored = dict(cursor.fetchall())
+        corrections = {}
+        for name, query in STATS_QUERIES.items():
+            actual = cursor.execute(query).fetchone()[0]
+            if stored.get(name) != actual:
+                corrections[name] = (stored.get(name), actual)
+                cursor.execute('INSERT OR REPLACE INTO Stats (name, value) VALUES (?, ?)', (name, actual))
+        conn.commit()
+        return corrections
+
+@cached_query('Polls')
 def get_all_polls():
     """Retrieves all polls from the Polls table."""
     with create_connection() as conn:
@@ -426,19 +1404,11 @@ def get_poll_by_id(poll_id):
         poll = cursor.fetchone()
         if poll:
             # Convert to a dictionary for easier access
-            poll_dict = {
-                'poll_id': poll[0],
-                'poll_question': poll[1],
-                'is_public': bool(poll[2]),
-                'creator_id': poll[3],
-                'group_id': poll[4],
-                'start_time': poll[5],
-                'end_time': poll[6],
-            }
-            return poll_dict
+            return poll_to_dict(poll)
         else:
             return None
     
+@cached_query('Users')
 def get_users_by_role(role):
     """Retrieves users who have a specific role."""
     with create_connection() as conn:
@@ -457,30 +1427,71 @@ def get_polls_by_group(group_id):
         polls = cursor.fetchall()
         return polls 
 
+def search_polls(query='', status=None, is_public=None, creator_id=None, group_id=None,
+                 page=0, page_size=20, now=None):
+    """Returns one page of Polls rows matching the filters and whether more pages exist.
+
+    Matches are ranked by relevance when there is a query and newest first
+    otherwise. status is 'live', 'ended' or 'upcoming'; the other filters are
+    skipped when None.
+    """
+    now_ts = to_epoch(now or datetime.now())
+    conditions, params = [], []
+    if status == 'live':
+        conditions.append('Polls.start_ts <= ? AND Polls.end_ts >= ?')
+        params += [now_ts, now_ts]
+    elif status == 'ended':
+        conditions.append('Polls.end_ts < ?')
+        params.append(now_ts)
+    elif status == 'upcoming':
+        conditions.append('Polls.start_ts > ?')
+        params.append(now_ts)
+    elif status is not None:
+        raise ValueError(f"Unknown poll status: {status}")
+    if is_public is not None:
+        conditions.append('Polls.is_public = ?')
+        params.append(int(is_public))
+    if creator_id is not None:
+        conditions.append('Polls.creator_id = ?')
+        params.append(creator_id)
+    if group_id is not None:
+        conditions.append('Polls.group_id = ?')
+        params.append(group_id)
+
+    with closing(create_connection()) as conn:
+        source, order = 'Polls', 'Polls.poll_id DESC'
+        if query.split() and _has_search_table(conn, 'PollSearch'):
+            source = 'PollSearch JOIN Polls ON Polls.poll_id = PollSearch.rowid'
+            order = 'PollSearch.rank, Polls.poll_id DESC'
+            conditions.insert(0, 'PollSearch MATCH ?')
+            params.insert(0, _fts_query(query))
+        else:
+            for term in query.split():
+                conditions.append("Polls.poll_question LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(term))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT Polls.* FROM {source}
+            {where}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+        ''', params + [page_size + 1, page * page_size])
+        polls = cursor.fetchall()
+        return polls[:page_size], len(polls) > page_size
+
 def get_current_polls_by_group(group_id):
     """Retrieves current polls for a specific group."""
-    now = datetime.now()
-    with create_connection() as conn:
+    return [poll_to_dict(poll) for poll in get_live_polls() if poll[4] == group_id]
+
+@cached_query('Groups')
+def get_all_groups():
+    """Retrieve all groups."""
+    with closing(create_connection()) as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM Polls
-            WHERE group_id = ? AND start_time <= ? AND end_time >= ?
-        ''', (group_id, now, now))
-        polls = cursor.fetchall()
-        # Convert to list of dictionaries
-        poll_list = []
-        for poll in polls:
-            poll_dict = {
-                'poll_id': poll[0],
-                'poll_question': poll[1],
-                'is_public': bool(poll[2]),
-                'creator_id': poll[3],
-                'group_id': poll[4],
-                'start_time': poll[5],
-                'end_time': poll[6],
-            }
-            poll_list.append(poll_dict)
-        return poll_list
+        cursor.execute('SELECT * FROM Groups')
+        groups = cursor.fetchall()
+        return groups
 
 def delete_group_member(group_id, user_id):
     """Removes a user from a group."""
@@ -490,9 +1501,11 @@ def delete_group_member(group_id, user_id):
             DELETE FROM GroupMembers WHERE group_id = ? AND user_id = ?
         ''', (group_id, user_id))
         conn.commit()
+        bump_table_generation('GroupMembers')
 
 # database.py
 
+@cached_query('Polls', 'GroupMembers')
 def get_polls_user_can_see_results(user_id):
     """Retrieve all polls that the user can see results for."""
     with create_connection() as conn:
@@ -517,7 +1530,40 @@ def get_polls_user_can_see_results(user_id):
         # Combine and return the polls as a list of dictionaries
         polls = [dict(poll) for poll in public_polls + private_polls]
         return polls
+
+# Query tracing for the admin Performance page (see perf.py). Keep this below
+# the last function definition: only functions defined above are wrapped.
+add_statement_tracer(perf.trace_statement)
+perf.instrument_functions(globals(), exclude={
+    'bump_table_generation', 'get_table_generation', 'cached_query', 'get_cache_stats',
+    'clear_query_cache', 'get_pool', 'create_connection', 'add_statement_tracer',
+    'remove_statement_tracer',
+})
+
 # Initialize the database when the module is run
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Voting app database maintenance.")
+    parser.add_argument('command', nargs='?', default='init',
+                        choices=['init', 'verify-tallies', 'rebuild-tallies', 'reconcile-stats',
+                                 'backfill-vote-times'])
+    args = parser.parse_args()
+
     init_db()
-    print("Database initialized.")
+    if args.command == 'init':
+        print("Database initialized.")
+    elif args.command == 'verify-tallies':
+        mismatches = verify_vote_tallies()
+        for option_id, stored, actual in mismatches:
+            print(f"Option {option_id}: stored {stored}, actual {actual}")
+        print(f"{len(mismatches)} option(s) with incorrect vote counts.")
+    elif args.command == 'rebuild-tallies':
+        print(f"Rebuilt vote counts for {rebuild_vote_tallies()} option(s).")
+    elif args.command == 'reconcile-stats':
+        corrections = reconcile_stats()
+        for name, (stored, actual) in corrections.items():
+            print(f"{name}: stored {stored}, actual {actual}")
+        print(f"Corrected {len(corrections)} dashboard total(s).")
+    elif args.command == 'backfill-vote-times':
+        print(f"Estimated cast times for {backfill_vote_times()} vote(s).")
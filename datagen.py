@@ -0,0 +1,222 @@
+# datagen.py
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import database
+from poll_index import to_epoch
+
+# Synthetic data for benchmarking. Fills a scratch database through the same
+# schema and migrations as the app, with skew similar to production: a few
+# polls attract most of the votes, a few groups hold most of the members,
+# and a few conversations hold most of the messages.
+#
+# Generated users share a dummy password hash and cannot log in.
+DUMMY_PASSWORD_HASH = b'$2b$04$datagen.datagen.datagen.datagen.datagen.datagen.data'
+
+DEFAULTS = {
+    'users': 10000,
+    'groups': 100,
+    'members_per_group': 200,
+    'polls': 2000,
+    'max_options': 6,
+    'votes': 1000000,
+    'messages': 100000,
+}
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights where item i is picked with probability ~ 1 / (i + 1) ** exponent."""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+def _batched_insert(cursor, sql, rows, batch_size, conn):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            batch.clear()
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+
+def generate(db_path, users=DEFAULTS['users'], groups=DEFAULTS['groups'],
+             members_per_group=DEFAULTS['members_per_group'], polls=DEFAULTS['polls'],
+             max_options=DEFAULTS['max_options'], votes=DEFAULTS['votes'],
+             messages=DEFAULTS['messages'], seed=0, batch_size=50000, progress=print):
+    """Create and fill a scratch database at db_path. Returns the row counts written."""
+    rng = random.Random(seed)
+    database.DB_NAME = db_path
+    database.init_db()
+    groups = min(groups, users - 1)
+
+    with database.create_connection() as conn:
+        cursor = conn.cursor()
+
+        # Users: one admin, one group admin per group, regular users after that.
+        def user_rows():
+            yield ('admin', DUMMY_PASSWORD_HASH, 'admin')
+            for i in range(1, users):
+                role = 'group_admin' if i <= groups else 'user'
+                yield (f'user{i}', DUMMY_PASSWORD_HASH, role)
+        _batched_insert(cursor, 'INSERT INTO Users (username, password_hash, role) VALUES (?, ?, ?)',
+                        user_rows(), batch_size, conn)
+        user_ids = [row[0] for row in cursor.execute('SELECT user_id FROM Users ORDER BY user_id')]
+        admin_id = user_ids[0]
+        group_admin_ids = user_ids[1:groups + 1]
+        progress(f"users: {len(user_ids)}")
+
+        _batched_insert(cursor, 'INSERT INTO Groups (group_name, admin_user_id) VALUES (?, ?)',
+                        ((f'group{i}', admin) for i, admin in enumerate(group_admin_ids)), batch_size, conn)
+        group_ids = [row[0] for row in cursor.execute('SELECT group_id FROM Groups ORDER BY group_id')]
+        progress(f"groups: {len(group_ids)}")
+
+        # Memberships: group sizes follow a Zipf curve, most requests are accepted.
+        group_weights = zipf_weights(len(group_ids))
+        scale = members_per_group * len(group_ids) / group_weights[-1] if group_ids else 0
+        members_by_group = {}
+        def membership_rows():
+            previous = 0
+            for group_id, cumulative in zip(group_ids, group_weights):
+                size = min(len(user_ids), max(1, int((cumulative - previous) * scale)))
+                previous = cumulative
+                members = rng.sample(user_ids, size)
+                members_by_group[group_id] = members
+                for user_id in members:
+                    status = rng.choices(['accepted', 'pending', 'rejected'], [90, 8, 2])[0]
+                    yield (group_id, user_id, status)
+        _batched_insert(cursor, 'INSERT INTO GroupMembers (group_id, user_id, status) VALUES (?, ?, ?)',
+                        membership_rows(), batch_size, conn)
+        member_count = cursor.execute('SELECT COUNT(*) FROM GroupMembers').fetchone()[0]
+        progress(f"memberships: {member_count}")
+
+    # Polls: a mix of ended, live and upcoming windows; a third are group polls.
+    now = datetime.now()
+    group_admin_by_group = dict(zip(group_ids, group_admin_ids))
+    poll_batch = []
+    for i in range(polls):
+        start = now + timedelta(minutes=rng.randint(-60 * 24 * 60, 60 * 24 * 7))
+        end = start + timedelta(minutes=rng.randint(60, 60 * 24 * 14))
+        is_public = rng.random() < 0.66 or not group_ids
+        group_id = None if is_public else rng.choice(group_ids)
+        creator_id = admin_id if is_public else group_admin_by_group[group_id]
+        poll_batch.append({
+            'poll_question': f"Synthetic poll {i}: which option do you prefer?",
+            'is_public': is_public,
+            'creator_id': creator_id,
+            'group_id': group_id,
+            'start_time': start,
+            'end_time': end,
+            'options': [f"Option {j}" for j in range(rng.randint(2, max_options))],
+        })
+        if len(poll_batch) >= 1000:
+            database.create_polls_bulk(poll_batch)
+            poll_batch.clear()
+    if poll_batch:
+        database.create_polls_bulk(poll_batch)
+
+    with database.create_connection() as conn:
+        cursor = conn.cursor()
+        poll_rows = cursor.execute('SELECT poll_id, group_id FROM Polls ORDER BY poll_id').fetchall()
+        windows = {poll_id: (start_ts, end_ts) for poll_id, start_ts, end_ts in cursor.execute(
+            'SELECT poll_id, start_ts, end_ts FROM Polls')}
+        now_ts = to_epoch(now)
+        options_by_poll = {}
+        for option_id, poll_id in cursor.execute('SELECT option_id, poll_id FROM Options'):
+            options_by_poll.setdefault(poll_id, []).append(option_id)
+        progress(f"polls: {len(poll_rows)}")
+
+        # Votes: poll popularity is Zipf distributed, one vote per user per poll.
+        # Each poll has its own option preference so tallies are uneven.
+        rng.shuffle(poll_rows)
+        poll_weights = zipf_weights(len(poll_rows))
+        option_weights = {
+            poll_id: [rng.random() ** 2 for _ in options] for poll_id, options in options_by_poll.items()
+        }
+        max_votes = sum(
+            len(user_ids) if group_id is None else len(members_by_group.get(group_id, ()))
+            for poll_id, group_id in poll_rows
+        )
+        votes = min(votes, max_votes)
+        def vote_rows():
+            seen = set()
+            written = 0
+            attempts = 0
+            while written < votes and attempts < votes * 20:
+                attempts += 1
+                poll_id, group_id = rng.choices(poll_rows, cum_weights=poll_weights)[0]
+                voters = user_ids if group_id is None else members_by_group.get(group_id)
+                if not voters or poll_id not in options_by_poll:
+                    continue
+                user_id = rng.choice(voters)
+                key = (poll_id, user_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+                written += 1
+                option_id = rng.choices(options_by_poll[poll_id], option_weights[poll_id])[0]
+                start_ts, end_ts = windows[poll_id]
+                cast_at = start_ts + int(rng.random() * max(min(end_ts, now_ts) - start_ts, 0))
+                yield (poll_id, option_id, user_id, cast_at)
+        _batched_insert(cursor, 'INSERT INTO Votes (poll_id, option_id, user_id, cast_at) VALUES (?, ?, ?, ?)',
+                        vote_rows(), batch_size, conn)
+        vote_count = cursor.execute('SELECT COUNT(*) FROM Votes').fetchone()[0]
+        progress(f"votes: {vote_count}")
+
+        # Messages: most traffic is between the admin and the busiest group admins.
+        admin_weights = zipf_weights(len(group_admin_ids)) if group_admin_ids else None
+        def message_rows():
+            for i in range(messages):
+                if admin_weights and rng.random() < 0.8:
+                    other = rng.choices(group_admin_ids, cum_weights=admin_weights)[0]
+                    sender, receiver = (admin_id, other) if rng.random() < 0.5 else (other, admin_id)
+                else:
+                    sender, receiver = rng.sample(user_ids, 2)
+                yield (sender, receiver, f"Synthetic message {i}")
+        _batched_insert(cursor, 'INSERT INTO Messages (sender_id, receiver_id, message_text) VALUES (?, ?, ?)',
+                        message_rows(), batch_size, conn)
+        message_count = cursor.execute('SELECT COUNT(*) FROM Messages').fetchone()[0]
+        progress(f"messages: {message_count}")
+
+        cursor.execute('ANALYZE')
+
+    # The rows above bypassed the write functions, so invalidate caches by hand.
+    database.bump_table_generation('Users', 'Groups', 'GroupMembers', 'Polls', 'Options', 'Votes', 'Messages')
+    database.user_cache.clear()
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'memberships': member_count,
+        'polls': len(poll_rows),
+        'votes': vote_count,
+        'messages': message_count,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a scratch database with synthetic voting data.")
+    parser.add_argument('path', help="Scratch database file to create.")
+    parser.add_argument('--force', action='store_true', help="Overwrite the file if it exists.")
+    parser.add_argument('--seed', type=int, default=0)
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+    args = parser.parse_args()
+
+    if os.path.abspath(args.path) == os.path.abspath(database.DB_NAME):
+        parser.error("refusing to generate data into the application database")
+    if os.path.exists(args.path):
+        if not args.force:
+            parser.error(f"{args.path} exists; pass --force to overwrite it")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+    started = time.perf_counter()
+    counts = generate(args.path, seed=args.seed, **{name: getattr(args, name) for name in DEFAULTS})
+    print(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# export.py
+
+import argparse
+import csv
+import os
+import sys
+from contextlib import closing
+
+import database
+
+# Streaming exports of raw votes, per-option tallies and group memberships.
+#
+# Rows are read with fetchmany() and written chunk by chunk, so memory use
+# does not grow with the table size. CSV needs nothing extra; Parquet needs
+# the optional pyarrow package.
+#
+# Nightly job example:
+#     python export.py votes tallies memberships --format parquet --output-dir exports/
+DEFAULT_CHUNK_SIZE = 5000
+FORMATS = ('csv', 'parquet')
+
+# Each export lists its (column, type) pairs, the query producing them in
+# that order, and the filters it supports mapped to the SQL they add.
+EXPORTS = {
+    'votes': {
+        'columns': [
+            ('vote_id', 'int64'), ('poll_id', 'int64'), ('poll_question', 'string'),
+            ('option_id', 'int64'), ('option_text', 'string'), ('user_id', 'int64'),
+            ('username', 'string'), ('cast_at', 'int64'), ('cast_time', 'string'),
+        ],
+        'sql': '''
+            SELECT Votes.vote_id, Votes.poll_id, Polls.poll_question, Votes.option_id, Options.option_text,
+                   Votes.user_id, Users.username, Votes.cast_at,
+                   strftime('%Y-%m-%d %H:%M:%S', Votes.cast_at, 'unixepoch')
+            FROM Votes
+            LEFT JOIN Polls ON Polls.poll_id = Votes.poll_id
+            LEFT JOIN Options ON Options.option_id = Votes.option_id
+            LEFT JOIN Users ON Users.user_id = Votes.user_id
+            {where}
+            ORDER BY Votes.vote_id
+        ''',
+        'filters': {'poll_id': 'Votes.poll_id = ?'},
+    },
+    'tallies': {
+        'columns': [
+            ('poll_id', 'int64'), ('poll_question', 'string'), ('option_id', 'int64'),
+            ('option_text', 'string'), ('vote_count', 'int64'), ('is_closed', 'int64'),
+        ],
+        'sql': '''
+            SELECT Polls.poll_id, Polls.poll_question, Options.option_id, Options.option_text,
+                   Options.vote_count, Polls.is_closed
+            FROM Polls
+            JOIN Options ON Options.poll_id = Polls.poll_id
+            {where}
+            ORDER BY Polls.poll_id, Options.option_id
+        ''',
+        'filters': {'poll_id': 'Polls.poll_id = ?'},
+    },
+    'memberships': {
+        'columns': [
+            ('member_id', 'int64'), ('group_id', 'int64'), ('group_name', 'string'),
+            ('user_id', 'int64'), ('username', 'string'), ('status', 'string'),
+        ],
+        'sql': '''
+            SELECT GroupMembers.member_id, GroupMembers.group_id, Groups.group_name,
+                   GroupMembers.user_id, Users.username, GroupMembers.status
+            FROM GroupMembers
+            LEFT JOIN Groups ON Groups.group_id = GroupMembers.group_id
+            LEFT JOIN Users ON Users.user_id = GroupMembers.user_id
+            {where}
+            ORDER BY GroupMembers.member_id
+        ''',
+        'filters': {'group_id': 'GroupMembers.group_id = ?'},
+    },
+}
+
+def column_names(name):
+    return [column for column, _ in EXPORTS[name]['columns']]
+
+def iter_chunks(name, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Yield the rows of an export as lists of at most chunk_size tuples.
+
+    Filters that are None are ignored; unsupported ones raise ValueError.
+    """
+    export = EXPORTS[name]
+    conditions, params = [], []
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if key not in export['filters']:
+            raise ValueError(f"The {name} export cannot be filtered by {key}")
+        conditions.append(export['filters'][key])
+        params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    with closing(database.create_connection()) as conn:
+        cursor = conn.cursor()
+        cursor.execute(export['sql'].format(where=where), params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+def write_csv(name, file, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Write an export to a text file object as CSV with a header row. Returns the row count."""
+    writer = csv.writer(file)
+    writer.writerow(column_names(name))
+    count = 0
+    for rows in iter_chunks(name, chunk_size, **filters):
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def write_parquet(name, file, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Write an export to a path or binary file object as Parquet, one row group per chunk.
+
+    Returns the row count. Needs pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from error
+
+    schema = pa.schema([(column, getattr(pa, type_name)()) for column, type_name in EXPORTS[name]['columns']])
+    count = 0
+    with pq.ParquetWriter(file, schema) as writer:
+        for rows in iter_chunks(name, chunk_size, **filters):
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(rows)
+        if count == 0:
+            writer.write_table(schema.empty_table())
+    return count
+
+def export_to_file(name, path, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Write an export to `path` in the given format. Returns the row count."""
+    if fmt == 'parquet':
+        return write_parquet(name, path, chunk_size, **filters)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        return write_csv(name, f, chunk_size, **filters)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export votes, tallies and memberships to CSV or Parquet.")
+    parser.add_argument('exports', nargs='+', choices=sorted(EXPORTS))
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--output-dir', default='.', help="Directory for the <export>.<format> files; "
+                                                          "use - to write a single CSV export to stdout.")
+    parser.add_argument('--db', default=database.DB_NAME)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--poll-id', type=int, help="Only this poll (votes and tallies).")
+    parser.add_argument('--group-id', type=int, help="Only this group (memberships).")
+    args = parser.parse_args()
+
+    database.DB_NAME = args.db
+    database.init_db()
+    if args.output_dir == '-':
+        if args.format != 'csv' or len(args.exports) != 1:
+            parser.error("stdout output supports a single CSV export")
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for name in args.exports:
+        filters = {key: value for key, value in (('poll_id', args.poll_id), ('group_id', args.group_id))
+                   if key in EXPORTS[name]['filters']}
+        if args.output_dir == '-':
+            write_csv(name, sys.stdout, args.chunk_size, **filters)
+            continue
+        path = os.path.join(args.output_dir, f"{name}.{args.format}")
+        count = export_to_file(name, path, args.format, args.chunk_size, **filters)
+        print(f"{name}: {count} row(s) written to {path}")
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,17 @@
 # group_admin.py
 
 import streamlit as st
-from database import (
-    get_group_id_by_admin,
-    get_group_member_count,
-    get_group_members,
-    get_group_member_requests,
-    update_group_member_status,
-    delete_group_member,
-    get_polls_by_group,
-    create_poll,
-    add_option,
-    get_vote_counts,
-    get_poll_by_id,
-    get_current_polls_by_group,
-    get_user_by_id,
-    create_connection,
-)
+from poll_index import POLL_TYPES
+from repository import get_repository
 from datetime import datetime
+import csv
+import io
 from chat import group_admin_chat
+from poll_picker import select_poll
+from poll_results import show_ranked_results, show_turnout
 from auth import logout
 import pandas as pd
+from perf import page
 
 def group_admin_dashboard():
     st.sidebar.title("Group Admin Dashboard")
@@ -35,36 +26,38 @@ def group_admin_dashboard():
     ]
     choice = st.sidebar.selectbox("Select an option", options)
 
-    if choice == "Dashboard":
-        show_dashboard()
-    elif choice == "Monitor Polls":
-        monitor_polls()
-    elif choice == "Create Poll":
-        create_new_poll()
-    elif choice == "Group Members":
-        manage_group_members()
-    elif choice == "Requests":
-        manage_requests()
-    elif choice == "Chat":
-        group_admin_chat()
-    elif choice == "Logout":
-        logout()
-    else:
-        st.error("Invalid choice.")
+    with page(f"group_admin/{choice}"):
+        if choice == "Dashboard":
+            show_dashboard()
+        elif choice == "Monitor Polls":
+            monitor_polls()
+        elif choice == "Create Poll":
+            create_new_poll()
+        elif choice == "Group Members":
+            manage_group_members()
+        elif choice == "Requests":
+            manage_requests()
+        elif choice == "Chat":
+            group_admin_chat()
+        elif choice == "Logout":
+            logout()
+        else:
+            st.error("Invalid choice.")
 
 def show_dashboard():
+    repo = get_repository()
     st.header("Group Admin Dashboard")
-    group_id = get_group_id_by_admin(st.session_state.user_id)
+    group_id = repo.get_group_id_by_admin(st.session_state.user_id)
     if group_id:
         # Display group-specific stats
-        member_count = get_group_member_count(group_id)
+        member_count = repo.get_group_member_count(group_id)
         st.subheader("Group Information")
         st.write(f"**Group ID:** {group_id}")
         st.write(f"**Number of Members:** {member_count}")
         
         # Display current polls in the group
         st.subheader("Current Group Polls")
-        current_polls = get_current_polls_by_group(group_id)
+        current_polls = repo.get_current_polls_by_group(group_id)
         if current_polls:
             for poll in current_polls:
                 st.write(f"**{poll['poll_question']}**")
@@ -76,33 +69,33 @@ def show_dashboard():
         st.error("You are not assigned to any group.")
 
 def monitor_polls():
+    repo = get_repository()
     st.header("Monitor Group Polls")
-    group_id = get_group_id_by_admin(st.session_state.user_id)
+    group_id = repo.get_group_id_by_admin(st.session_state.user_id)
     if group_id:
-        polls = get_polls_by_group(group_id)
-        if polls:
-            poll_options = [f"{poll[0]}: {poll[1]}" for poll in polls]
-            selected_poll_str = st.selectbox("Select a poll to monitor:", poll_options)
-            selected_poll_id = int(selected_poll_str.split(":")[0])
-
-            poll = get_poll_by_id(selected_poll_id)
+        selected_poll_id = select_poll('group_monitor', group_id=group_id)
+        if selected_poll_id is not None:
+            poll = repo.get_poll_by_id(selected_poll_id)
             if poll:
                 st.subheader(f"Poll: {poll['poll_question']}")
-                results = get_vote_counts(selected_poll_id)
-                if results:
-                    df = pd.DataFrame(results, columns=["Option", "Votes"])
-                    st.bar_chart(df.set_index("Option"))
-                    st.table(df)
+                if poll['poll_type'] == 'ranked':
+                    show_ranked_results(repo.get_ranked_choice_results(selected_poll_id))
                 else:
-                    st.info("No votes have been cast in this poll yet.")
+                    results = repo.get_final_vote_counts(selected_poll_id)
+                    if results:
+                        df = pd.DataFrame(results, columns=["Option", "Votes"])
+                        st.bar_chart(df.set_index("Option"))
+                        st.table(df)
+                    else:
+                        st.info("No votes have been cast in this poll yet.")
+                show_turnout(repo.get_vote_turnout(selected_poll_id), key="turnout_resolution_group_admin")
             else:
                 st.error("Poll not found.")
-        else:
-            st.info("No polls available in your group.")
     else:
         st.error("You are not assigned to any group.")
 
 def create_new_poll():
+    repo = get_repository()
     st.header("Create a New Group Poll")
     poll_question = st.text_input("Poll Question:")
     start_date = st.date_input("Start Date", datetime.now().date(),key='start_date')
@@ -116,30 +109,29 @@ def create_new_poll():
     end_datetime = datetime.combine(end_date, end_time)
     if start_datetime >= end_datetime:
         st.warning("End time must be after start time.")
-    option1 = st.text_input("Option 1:")
-    option2 = st.text_input("Option 2:")
-    option3 = st.text_input("Option 3 (optional):")
-    option4 = st.text_input("Option 4 (optional):")
+    poll_type = st.selectbox("Poll type:", list(POLL_TYPES), format_func=POLL_TYPES.get)
+    num_options = st.number_input("Number of options:", min_value=2, value=2, step=1)
+    option_inputs = [st.text_input(f"Option {i + 1}:", key=f"option_{i}") for i in range(int(num_options))]
+    options = [option.strip() for option in option_inputs if option.strip()]
+    distinct_options = len(set(options)) == len(options)
+    if not distinct_options:
+        st.warning("Options must all be different.")
 
     if st.button("Create Poll"):
-        if poll_question and option1 and option2 and start_datetime < end_datetime:
+        if poll_question and len(options) >= 2 and distinct_options and start_datetime < end_datetime:
             creator_id = st.session_state.user_id
-            group_id = get_group_id_by_admin(creator_id)
+            group_id = repo.get_group_id_by_admin(creator_id)
             if group_id:
-                poll_id = create_poll(
+                repo.create_poll_with_options(
                     poll_question,
                     is_public=False,
                     creator_id=creator_id,
                     group_id=group_id,
                     start_time=start_datetime,
                     end_time=end_datetime,
+                    options=options,
+                    poll_type=poll_type,
                 )
-                add_option(poll_id, option1)
-                add_option(poll_id, option2)
-                if option3:
-                    add_option(poll_id, option3)
-                if option4:
-                    add_option(poll_id, option4)
                 st.success("Poll created successfully.")
             else:
                 st.error("You are not assigned to any group.")
@@ -147,10 +139,11 @@ def create_new_poll():
             st.error("Please fill out all required fields.")
 
 def manage_group_members():
+    repo = get_repository()
     st.header("Manage Group Members")
-    group_id = get_group_id_by_admin(st.session_state.user_id)
+    group_id = repo.get_group_id_by_admin(st.session_state.user_id)
     if group_id:
-        members = get_group_members(group_id, status='accepted')
+        members = repo.get_group_members(group_id, status='accepted')
         if members:
             member_options = [f"{member[0]}: {member[1]}" for member in members]
             selected_member_str = st.selectbox("Select a member:", member_options)
@@ -158,7 +151,7 @@ def manage_group_members():
 
             action = st.selectbox("Action:", ["View Details", "Remove Member"])
             if action == "View Details":
-                user = get_user_by_id(selected_member_id)
+                user = repo.get_user_by_id(selected_member_id)
                 if user:
                     st.write(f"**Member ID:** {user[0]}")
                     st.write(f"**Username:** {user[1]}")
@@ -167,35 +160,54 @@ def manage_group_members():
                     st.error("User not found.")
             elif action == "Remove Member":
                 if st.button("Remove Member"):
-                    delete_group_member(group_id, selected_member_id)
+                    repo.delete_group_member(group_id, selected_member_id)
                     st.success("Member removed from the group.")
                     st.rerun()
         else:
             st.info("No members in your group.")
+        import_members(group_id)
     else:
         st.error("You are not assigned to any group.")
 
+def read_usernames(uploaded_file):
+    """Usernames from the first column of a CSV file; a 'username' header row is skipped."""
+    rows = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig'))
+    usernames = [row[0].strip() for row in rows if row and row[0].strip()]
+    if usernames and usernames[0].lower() == 'username':
+        usernames = usernames[1:]
+    return usernames
+
+def import_members(group_id):
+    st.subheader("Import Members")
+    uploaded_file = st.file_uploader("CSV file with one username per row:", type="csv")
+    if uploaded_file is not None and st.button("Import Members"):
+        written, unknown = get_repository().import_group_members(group_id, read_usernames(uploaded_file))
+        st.success(f"Added or updated {written} member(s).")
+        if unknown:
+            st.warning(f"{len(unknown)} unknown username(s): {', '.join(unknown[:20])}"
+                       + (" ..." if len(unknown) > 20 else ""))
+
 def manage_requests():
+    repo = get_repository()
     st.header("Manage Join Requests")
-    group_id = get_group_id_by_admin(st.session_state.user_id)
+    group_id = repo.get_group_id_by_admin(st.session_state.user_id)
     if group_id:
-        requests = get_group_member_requests(group_id)
+        requests = repo.get_group_member_requests(group_id)
         if requests:
-            for request in requests:
-                member_id = request[0]
-                user_id = request[1]
-                username = request[2]
-                st.write(f"**Username:** {username}")
-                accept = st.button(f"Accept {username}", key=f"accept_{member_id}")
-                reject = st.button(f"Reject {username}", key=f"reject_{member_id}")
-                if accept:
-                    update_group_member_status(member_id, 'accepted')
-                    st.success(f"{username} has been added to the group.")
-                    st.rerun()
-                if reject:
-                    update_group_member_status(member_id, 'rejected')
-                    st.info(f"{username}'s request has been rejected.")
-                    st.rerun()
+            requests_dict = {f"{request[2]} (ID: {request[1]})": request[0] for request in requests}
+            selected = st.multiselect("Select requests:", list(requests_dict.keys()))
+            selected_ids = [requests_dict[label] for label in selected]
+
+            col1, col2, col3 = st.columns(3)
+            if col1.button(f"Accept all ({len(requests)})"):
+                repo.update_group_member_statuses(group_id, list(requests_dict.values()), 'accepted')
+                st.rerun()
+            if col2.button("Accept selected", disabled=not selected_ids):
+                repo.update_group_member_statuses(group_id, selected_ids, 'accepted')
+                st.rerun()
+            if col3.button("Reject selected", disabled=not selected_ids):
+                repo.update_group_member_statuses(group_id, selected_ids, 'rejected')
+                st.rerun()
         else:
             st.info("No pending join requests.")
     else:
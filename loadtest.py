@@ -0,0 +1,255 @@
+# loadtest.py
+
+import argparse
+import json
+import multiprocessing
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import database
+import vote_queue
+from benchmark import summarize
+
+# Concurrent voter load test. Drives the real database.py functions from a
+# pool of processes, each running a pool of threads, and simulates the burst
+# when polls open: votes mixed with results reads and chat traffic.
+#
+# Run it against a scratch database (see datagen.py); it writes votes and
+# messages. SQLITE_BUSY errors are retried with backoff, and the time lost
+# to them is reported as lock wait. Waits inside SQLite's own busy_timeout
+# are not visible to Python and show up as latency instead.
+
+CONFIGS = {
+    'wal': {'pragmas': {}, 'batched': False},
+    'wal-batched': {'pragmas': {}, 'batched': True},
+    'wal-no-busy-timeout': {'pragmas': {'busy_timeout': 0}, 'batched': False},
+    'rollback-journal': {'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'}, 'batched': False},
+}
+
+OPERATION_MIX = {
+    'vote': 50,
+    'results': 30,
+    'chat_send': 10,
+    'chat_read': 10,
+}
+
+HOT_POLLS = 5
+MAX_RETRIES = 20
+RETRY_BACKOFF_SECONDS = 0.005
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def prepare_hot_polls(count=HOT_POLLS):
+    """Create `count` freshly opened public polls in the current database. Returns (poll_id, option_ids) pairs."""
+    with database.create_connection() as conn:
+        creator = conn.execute("SELECT user_id FROM Users WHERE role = 'admin' LIMIT 1").fetchone()
+    creator_id = creator[0] if creator else 1
+    now = datetime.now()
+    poll_ids = database.create_polls_bulk([
+        {
+            'poll_question': f"Load test poll {i} ({now:%H:%M:%S})",
+            'is_public': True,
+            'creator_id': creator_id,
+            'group_id': None,
+            'start_time': now - timedelta(minutes=1),
+            'end_time': now + timedelta(hours=1),
+            'options': ["Yes", "No", "Abstain"],
+        }
+        for i in range(count)
+    ])
+    return [(poll_id, [option[0] for option in database.get_options_by_poll(poll_id)]) for poll_id in poll_ids]
+
+class WorkerStats:
+    def __init__(self):
+        self.latencies = {name: [] for name in OPERATION_MIX}
+        self.busy_errors = 0
+        self.other_errors = 0
+        self.failed_operations = 0
+        self.lock_wait = 0.0
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            'latencies': self.latencies,
+            'busy_errors': self.busy_errors,
+            'other_errors': self.other_errors,
+            'failed_operations': self.failed_operations,
+            'lock_wait': self.lock_wait,
+        }
+
+def _run_operation(stats, name, func):
+    """Run one operation, retrying SQLITE_BUSY, and record its latency."""
+    start = time.perf_counter()
+    lock_wait = 0.0
+    for attempt in range(MAX_RETRIES + 1):
+        attempt_start = time.perf_counter()
+        try:
+            func()
+            break
+        except sqlite3.OperationalError as error:
+            if not _is_busy(error):
+                with stats.lock:
+                    stats.other_errors += 1
+                    stats.failed_operations += 1
+                return
+            with stats.lock:
+                stats.busy_errors += 1
+            if attempt == MAX_RETRIES:
+                with stats.lock:
+                    stats.failed_operations += 1
+                    stats.lock_wait += lock_wait + time.perf_counter() - attempt_start
+                return
+            time.sleep(RETRY_BACKOFF_SECONDS * (attempt + 1))
+            lock_wait += time.perf_counter() - attempt_start
+        except Exception:
+            with stats.lock:
+                stats.other_errors += 1
+                stats.failed_operations += 1
+            return
+    elapsed = time.perf_counter() - start
+    with stats.lock:
+        stats.latencies[name].append(elapsed)
+        stats.lock_wait += lock_wait
+
+def _thread_main(stats, hot_polls, user_ids, deadline, seed):
+    rng = random.Random(seed)
+    names = list(OPERATION_MIX)
+    weights = list(OPERATION_MIX.values())
+
+    def vote():
+        poll_id, option_ids = rng.choice(hot_polls)
+        user_id = rng.choice(user_ids)
+        if not database.has_user_voted(poll_id, user_id):
+            vote_queue.submit_vote(poll_id, rng.choice(option_ids), user_id).result()
+
+    def results():
+        database.get_final_vote_counts(rng.choice(hot_polls)[0])
+
+    def chat_send():
+        sender, receiver = rng.sample(user_ids, 2)
+        database.send_message(sender, receiver, "load test message")
+
+    def chat_read():
+        sender, receiver = rng.sample(user_ids, 2)
+        database.get_messages_since(sender, receiver, 0)
+
+    operations = {'vote': vote, 'results': results, 'chat_send': chat_send, 'chat_read': chat_read}
+    while time.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        _run_operation(stats, name, operations[name])
+
+def set_journal_mode(db_path, journal_mode):
+    """Switch the database file to `journal_mode`. Needs the file to itself, so call it before workers connect."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        mode = conn.execute(f'PRAGMA journal_mode = {journal_mode}').fetchone()[0]
+    finally:
+        conn.close()
+    if mode.lower() != journal_mode.lower():
+        raise RuntimeError(f"Could not switch {db_path} to journal_mode {journal_mode} (still {mode}).")
+
+def run_process(db_path, config, threads, hot_polls, deadline, seed):
+    """Entry point of one load-test process: runs `threads` voter threads until the deadline."""
+    database.DB_NAME = db_path
+    # The parent has set the journal mode; switching it here would race the
+    # other workers' open connections.
+    pragmas = dict(database.PRAGMAS, **config['pragmas'])
+    database.PRAGMAS = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+    vote_queue.BATCHING_ENABLED = config['batched']
+    with database.create_connection() as conn:
+        user_ids = [row[0] for row in conn.execute('SELECT user_id FROM Users ORDER BY RANDOM() LIMIT 5000')]
+    if len(user_ids) < 2:
+        raise ValueError("The load-test database needs at least two users; create one with datagen.py.")
+
+    stats = WorkerStats()
+    workers = [
+        threading.Thread(target=_thread_main, args=(stats, hot_polls, user_ids, deadline, seed * 1000 + i))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if config['batched']:
+        vote_queue.get_vote_writer().stop()
+    database.get_pool().close_all()
+    return stats.to_dict()
+
+def run_load_test(db_path, config_name, threads=8, processes=1, duration=10.0):
+    """Run one configuration and return its throughput, latency and busy/error report."""
+    config = CONFIGS[config_name]
+    database.DB_NAME = db_path
+    database.get_pool().close_all()
+    hot_polls = prepare_hot_polls()
+    database.get_pool().close_all()
+    set_journal_mode(db_path, dict(database.PRAGMAS, **config['pragmas'])['journal_mode'])
+
+    started = time.perf_counter()
+    deadline = time.time() + duration
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        futures = [
+            executor.submit(run_process, db_path, config, threads, hot_polls, deadline, seed)
+            for seed in range(processes)
+        ]
+        worker_stats = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    total_operations = 0
+    for name in OPERATION_MIX:
+        latencies = [value for stats in worker_stats for value in stats['latencies'][name]]
+        total_operations += len(latencies)
+        if latencies:
+            operations[name] = dict(summarize(latencies), count=len(latencies), per_second=len(latencies) / elapsed)
+    return {
+        'config': config_name,
+        'threads': threads,
+        'processes': processes,
+        'duration_s': elapsed,
+        'operations_per_second': total_operations / elapsed,
+        'busy_errors': sum(stats['busy_errors'] for stats in worker_stats),
+        'other_errors': sum(stats['other_errors'] for stats in worker_stats),
+        'failed_operations': sum(stats['failed_operations'] for stats in worker_stats),
+        'lock_wait_s': sum(stats['lock_wait'] for stats in worker_stats),
+        'operations': operations,
+    }
+
+def print_report(reports):
+    print(f"{'config':<22}{'ops/s':>9}{'vote p50':>11}{'vote p99':>11}{'busy':>7}{'failed':>8}{'lock wait':>11}")
+    for report in reports:
+        vote = report['operations'].get('vote', {})
+        print(f"{report['config']:<22}{report['operations_per_second']:>9.0f}"
+              f"{vote.get('p50_ms', 0):>9.2f}ms{vote.get('p99_ms', 0):>9.2f}ms"
+              f"{report['busy_errors']:>7}{report['failed_operations']:>8}{report['lock_wait_s']:>10.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test concurrent voting against a scratch database.")
+    parser.add_argument('db', help="Scratch database to load (it will be written to).")
+    parser.add_argument('--config', action='append', choices=sorted(CONFIGS),
+                        help="Configuration to run; repeat to compare several (default: all).")
+    parser.add_argument('--threads', type=int, default=8, help="Threads per process.")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per configuration.")
+    parser.add_argument('--output', help="Write the reports as JSON to this file.")
+    args = parser.parse_args()
+
+    database.DB_NAME = args.db
+    database.init_db()
+    reports = [
+        run_load_test(args.db, name, args.threads, args.processes, args.duration)
+        for name in (args.config or list(CONFIGS))
+    ]
+    print_report(reports)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+# migrations.py
+
+# Schema migrations, applied in order on top of the tables created by
+# database.init_db(). The number of applied migrations is stored in the
+# database's PRAGMA user_version, so an existing voting_app.db is upgraded
+# in place and each migration runs exactly once.
+#
+# To change the schema, append a new function to MIGRATIONS. Never edit or
+# reorder migrations that have already shipped.
+
+import sqlite3
+
+def add_hot_path_indexes(cursor):
+    """Index the columns used by vote checks, tallies, poll listings and chat."""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_votes_poll_user ON Votes(poll_id, user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_votes_option ON Votes(option_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_options_poll ON Options(poll_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_groupmembers_group_status ON GroupMembers(group_id, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_groupmembers_user_status ON GroupMembers(user_id, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_polls_window ON Polls(start_time, end_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_polls_group ON Polls(group_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_polls_creator ON Polls(creator_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_pair ON Messages(sender_id, receiver_id)')
+
+def add_option_vote_counts(cursor):
+    """Keep a per-option vote counter on Options, maintained by triggers on Votes."""
+    cursor.execute('ALTER TABLE Options ADD COLUMN vote_count INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        UPDATE Options SET vote_count = (
+            SELECT COUNT(*) FROM Votes WHERE Votes.option_id = Options.option_id
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_tally_insert AFTER INSERT ON Votes
+        BEGIN
+            UPDATE Options SET vote_count = vote_count + 1 WHERE option_id = NEW.option_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_tally_delete AFTER DELETE ON Votes
+        BEGIN
+            UPDATE Options SET vote_count = vote_count - 1 WHERE option_id = OLD.option_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_tally_update AFTER UPDATE OF option_id ON Votes
+        BEGIN
+            UPDATE Options SET vote_count = vote_count - 1 WHERE option_id = OLD.option_id;
+            UPDATE Options SET vote_count = vote_count + 1 WHERE option_id = NEW.option_id;
+        END
+    ''')
+
+STATS_QUERIES = {
+    'total_users': 'SELECT COUNT(*) FROM Users',
+    'total_groups': 'SELECT COUNT(*) FROM Groups',
+    'total_polls': 'SELECT COUNT(*) FROM Polls',
+    'active_voters': 'SELECT COUNT(*) FROM VoterActivity',
+}
+
+def add_dashboard_stats(cursor):
+    """Keep dashboard totals in a Stats table, maintained by triggers."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # Votes per user, so "distinct voters" can be kept current without scanning Votes.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS VoterActivity (
+            user_id INTEGER PRIMARY KEY,
+            vote_count INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO VoterActivity (user_id, vote_count)
+        SELECT user_id, COUNT(*) FROM Votes GROUP BY user_id
+    ''')
+    for name, query in STATS_QUERIES.items():
+        cursor.execute(f'INSERT OR REPLACE INTO Stats (name, value) VALUES (?, ({query}))', (name,))
+
+    for table, stat in (('Users', 'total_users'), ('Groups', 'total_groups'), ('Polls', 'total_polls')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_stats_{table.lower()}_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE Stats SET value = value + 1 WHERE name = '{stat}';
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_stats_{table.lower()}_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE Stats SET value = value - 1 WHERE name = '{stat}';
+            END
+        ''')
+
+    add_voter = '''
+        INSERT INTO VoterActivity (user_id, vote_count) VALUES (NEW.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET vote_count = vote_count + 1;
+        UPDATE Stats SET value = value + 1 WHERE name = 'active_voters'
+        AND (SELECT vote_count FROM VoterActivity WHERE user_id = NEW.user_id) = 1;
+    '''
+    remove_voter = '''
+        UPDATE VoterActivity SET vote_count = vote_count - 1 WHERE user_id = OLD.user_id;
+        UPDATE Stats SET value = value - 1 WHERE name = 'active_voters'
+        AND (SELECT vote_count FROM VoterActivity WHERE user_id = OLD.user_id) = 0;
+        DELETE FROM VoterActivity WHERE user_id = OLD.user_id AND vote_count = 0;
+    '''
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS trg_stats_votes_insert AFTER INSERT ON Votes BEGIN {add_voter} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS trg_stats_votes_delete AFTER DELETE ON Votes BEGIN {remove_voter} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_votes_update AFTER UPDATE OF user_id ON Votes
+        WHEN OLD.user_id != NEW.user_id
+        BEGIN {remove_voter} {add_voter} END
+    ''')
+
+def add_poll_epoch_windows(cursor):
+    """Store poll windows as indexed integer epochs next to the display text."""
+    cursor.execute('ALTER TABLE Polls ADD COLUMN start_ts INTEGER')
+    cursor.execute('ALTER TABLE Polls ADD COLUMN end_ts INTEGER')
+    # Poll times are naive wall-clock text; strftime('%s') matches poll_index.to_epoch.
+    cursor.execute('''
+        UPDATE Polls SET
+            start_ts = CAST(strftime('%s', start_time) AS INTEGER),
+            end_ts = CAST(strftime('%s', end_time) AS INTEGER)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_polls_window_ts ON Polls(end_ts, start_ts)')
+    # Window queries use the epochs now; the text index only slows down writes.
+    cursor.execute('DROP INDEX IF EXISTS idx_polls_window')
+
+def add_poll_results(cursor):
+    """Closed flag on Polls plus a PollResults table for the snapshots taken at close time."""
+    cursor.execute('ALTER TABLE Polls ADD COLUMN is_closed INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS PollResults (
+            poll_id INTEGER PRIMARY KEY,
+            total_votes INTEGER NOT NULL,
+            results TEXT NOT NULL,
+            closed_at INTEGER NOT NULL,
+            FOREIGN KEY (poll_id) REFERENCES Polls(poll_id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_polls_open_end ON Polls(end_ts) WHERE is_closed = 0')
+
+def _create_fts_table(cursor, sql):
+    """Create an FTS5 table. Returns False if this SQLite build lacks FTS5."""
+    try:
+        cursor.execute(sql)
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        return False
+    return True
+
+def add_poll_search(cursor):
+    """Full-text index over poll questions, kept in sync with Polls by triggers.
+
+    Without FTS5 the index is skipped and database.search_polls falls back to LIKE.
+    """
+    created = _create_fts_table(cursor, '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS PollSearch USING fts5(
+            poll_question,
+            content='Polls',
+            content_rowid='poll_id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    if not created:
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_polls_search_insert AFTER INSERT ON Polls
+        BEGIN
+            INSERT INTO PollSearch (rowid, poll_question) VALUES (new.poll_id, new.poll_question);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_polls_search_delete AFTER DELETE ON Polls
+        BEGIN
+            INSERT INTO PollSearch (PollSearch, rowid, poll_question)
+            VALUES ('delete', old.poll_id, old.poll_question);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_polls_search_update AFTER UPDATE OF poll_question ON Polls
+        BEGIN
+            INSERT INTO PollSearch (PollSearch, rowid, poll_question)
+            VALUES ('delete', old.poll_id, old.poll_question);
+            INSERT INTO PollSearch (rowid, poll_question) VALUES (new.poll_id, new.poll_question);
+        END
+    ''')
+    cursor.execute("INSERT INTO PollSearch (PollSearch) VALUES ('rebuild')")
+
+def add_message_search(cursor):
+    """Full-text index over chat messages, kept in sync with Messages by triggers.
+
+    Without FTS5 the index is skipped and database.search_messages falls back to LIKE.
+    """
+    created = _create_fts_table(cursor, '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS MessageSearch USING fts5(
+            message_text,
+            content='Messages',
+            content_rowid='message_id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    if not created:
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_messages_search_insert AFTER INSERT ON Messages
+        BEGIN
+            INSERT INTO MessageSearch (rowid, message_text) VALUES (new.message_id, new.message_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_messages_search_delete AFTER DELETE ON Messages
+        BEGIN
+            INSERT INTO MessageSearch (MessageSearch, rowid, message_text)
+            VALUES ('delete', old.message_id, old.message_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_messages_search_update AFTER UPDATE OF message_text ON Messages
+        BEGIN
+            INSERT INTO MessageSearch (MessageSearch, rowid, message_text)
+            VALUES ('delete', old.message_id, old.message_text);
+            INSERT INTO MessageSearch (rowid, message_text) VALUES (new.message_id, new.message_text);
+        END
+    ''')
+    cursor.execute("INSERT INTO MessageSearch (MessageSearch) VALUES ('rebuild')")
+
+def add_unique_group_membership(cursor):
+    """One GroupMembers row per (group, user), so join requests can be a single upsert.
+
+    Existing duplicates are collapsed first, keeping the most advanced status
+    (accepted, then pending, then rejected) and the oldest row among equals.
+    """
+    cursor.execute('''
+        DELETE FROM GroupMembers WHERE member_id NOT IN (
+            SELECT member_id FROM (
+                SELECT member_id, ROW_NUMBER() OVER (
+                    PARTITION BY group_id, user_id
+                    ORDER BY CASE status WHEN 'accepted' THEN 0 WHEN 'pending' THEN 1 ELSE 2 END, member_id
+                ) AS position
+                FROM GroupMembers
+            )
+            WHERE position = 1
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_groupmembers_group_user ON GroupMembers(group_id, user_id)')
+
+TURNOUT_BUCKET_SECONDS = 60
+
+def add_vote_turnout(cursor):
+    """Record when each vote was cast and keep per-poll, per-minute turnout counts.
+
+    Votes.cast_at is a wall-clock epoch like Polls.start_ts. The write
+    functions set it; inserts that leave it NULL get the current local time
+    from a trigger. VoteTurnout buckets follow cast_at through inserts,
+    updates (including the backfill of legacy rows) and deletes. Votes cast
+    before this migration keep a NULL cast_at until database.py
+    backfill-vote-times estimates one.
+    """
+    cursor.execute('ALTER TABLE Votes ADD COLUMN cast_at INTEGER')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS VoteTurnout (
+            poll_id INTEGER NOT NULL,
+            bucket_ts INTEGER NOT NULL,
+            votes INTEGER NOT NULL,
+            PRIMARY KEY (poll_id, bucket_ts)
+        ) WITHOUT ROWID
+    ''')
+    bucket = f'(NEW.cast_at / {TURNOUT_BUCKET_SECONDS}) * {TURNOUT_BUCKET_SECONDS}'
+    old_bucket = f'(OLD.cast_at / {TURNOUT_BUCKET_SECONDS}) * {TURNOUT_BUCKET_SECONDS}'
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_cast_at AFTER INSERT ON Votes
+        WHEN NEW.cast_at IS NULL
+        BEGIN
+            UPDATE Votes SET cast_at = CAST(strftime('%s', 'now', 'localtime') AS INTEGER)
+            WHERE vote_id = NEW.vote_id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_turnout_insert AFTER INSERT ON Votes
+        WHEN NEW.cast_at IS NOT NULL
+        BEGIN
+            INSERT INTO VoteTurnout (poll_id, bucket_ts, votes) VALUES (NEW.poll_id, {bucket}, 1)
+            ON CONFLICT (poll_id, bucket_ts) DO UPDATE SET votes = votes + 1;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_turnout_delete AFTER DELETE ON Votes
+        WHEN OLD.cast_at IS NOT NULL
+        BEGIN
+            UPDATE VoteTurnout SET votes = votes - 1 WHERE poll_id = OLD.poll_id AND bucket_ts = {old_bucket};
+            DELETE FROM VoteTurnout WHERE poll_id = OLD.poll_id AND bucket_ts = {old_bucket} AND votes <= 0;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_votes_turnout_update AFTER UPDATE OF poll_id, cast_at ON Votes
+        BEGIN
+            UPDATE VoteTurnout SET votes = votes - 1
+            WHERE OLD.cast_at IS NOT NULL AND poll_id = OLD.poll_id AND bucket_ts = {old_bucket};
+            DELETE FROM VoteTurnout
+            WHERE OLD.cast_at IS NOT NULL AND poll_id = OLD.poll_id AND bucket_ts = {old_bucket} AND votes <= 0;
+            INSERT INTO VoteTurnout (poll_id, bucket_ts, votes)
+            SELECT NEW.poll_id, {bucket}, 1 WHERE NEW.cast_at IS NOT NULL
+            ON CONFLICT (poll_id, bucket_ts) DO UPDATE SET votes = votes + 1;
+        END
+    ''')
+
+def add_ranked_choice_polls(cursor):
+    """Ranked-choice polls: a poll_type on Polls and one RankedBallots row per voter.
+
+    A ballot's ranking is a blob of native 32-bit option_ids, first choice
+    first (see ranked_choice.encode_ranking). Ballots count towards the
+    active-voter total and the turnout rollup like Votes do. PollResults
+    gains ranked_results for the frozen round-by-round outcome.
+    """
+    cursor.execute('''
+        ALTER TABLE Polls ADD COLUMN poll_type TEXT NOT NULL DEFAULT 'single'
+        CHECK(poll_type IN ('single', 'ranked'))
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS RankedBallots (
+            ballot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            poll_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            ranking BLOB NOT NULL,
+            cast_at INTEGER NOT NULL,
+            UNIQUE (poll_id, user_id),
+            FOREIGN KEY (poll_id) REFERENCES Polls(poll_id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('ALTER TABLE PollResults ADD COLUMN ranked_results TEXT')
+
+    bucket = f'(NEW.cast_at / {TURNOUT_BUCKET_SECONDS}) * {TURNOUT_BUCKET_SECONDS}'
+    old_bucket = f'(OLD.cast_at / {TURNOUT_BUCKET_SECONDS}) * {TURNOUT_BUCKET_SECONDS}'
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_ballots_insert AFTER INSERT ON RankedBallots
+        BEGIN
+            INSERT INTO VoterActivity (user_id, vote_count) VALUES (NEW.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET vote_count = vote_count + 1;
+            UPDATE Stats SET value = value + 1 WHERE name = 'active_voters'
+            AND (SELECT vote_count FROM VoterActivity WHERE user_id = NEW.user_id) = 1;
+            INSERT INTO VoteTurnout (poll_id, bucket_ts, votes) VALUES (NEW.poll_id, {bucket}, 1)
+            ON CONFLICT (poll_id, bucket_ts) DO UPDATE SET votes = votes + 1;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_ballots_delete AFTER DELETE ON RankedBallots
+        BEGIN
+            UPDATE VoterActivity SET vote_count = vote_count - 1 WHERE user_id = OLD.user_id;
+            UPDATE Stats SET value = value - 1 WHERE name = 'active_voters'
+            AND (SELECT vote_count FROM VoterActivity WHERE user_id = OLD.user_id) = 0;
+            DELETE FROM VoterActivity WHERE user_id = OLD.user_id AND vote_count = 0;
+            UPDATE VoteTurnout SET votes = votes - 1 WHERE poll_id = OLD.poll_id AND bucket_ts = {old_bucket};
+            DELETE FROM VoteTurnout WHERE poll_id = OLD.poll_id AND bucket_ts = {old_bucket} AND votes <= 0;
+        END
+    ''')
+
+# Tables whose writes invalidate cached reads in database.py. A column list
+# limits the update trigger to the columns those reads depend on, so vote
+# count updates on Options do not invalidate anything.
+GENERATION_TABLES = {
+    'Users': None,
+    'Groups': None,
+    'GroupMembers': None,
+    'Polls': None,
+    'Options': ('poll_id', 'option_text'),
+    'RankedBallots': None,
+    'PollResults': None,
+    'Messages': None,
+}
+
+def add_table_generations(cursor):
+    """Per-table write counters kept by triggers, so a process can see other processes' writes.
+
+    database.py compares them against its own table generations whenever
+    PRAGMA data_version reports a commit from another connection.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS TableGenerations (
+            name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    for table, columns in GENERATION_TABLES.items():
+        cursor.execute('INSERT OR IGNORE INTO TableGenerations (name, generation) VALUES (?, 0)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            on = f"UPDATE OF {', '.join(columns)}" if event == 'UPDATE' and columns else event
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_generation_{table.lower()}_{event.lower()}
+                AFTER {on} ON {table}
+                BEGIN
+                    UPDATE TableGenerations SET generation = generation + 1 WHERE name = '{table}';
+                END
+            ''')
+
+MIGRATIONS = [
+    add_hot_path_indexes,
+    add_option_vote_counts,
+    add_dashboard_stats,
+    add_poll_epoch_windows,
+    add_poll_results,
+    add_poll_search,
+    add_message_search,
+    add_unique_group_membership,
+    add_vote_turnout,
+    add_ranked_choice_polls,
+    add_table_generations,
+]
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def apply_migrations(conn):
+    """Apply all pending migrations, each in its own transaction. Returns the new version."""
+    version = get_schema_version(conn)
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock.
+            if get_schema_version(conn) >= number:
+                conn.rollback()
+                continue
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
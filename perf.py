@@ -0,0 +1,158 @@
+# perf.py
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight query tracing for the admin "Performance" page.
+#
+# database.py wraps its data-access functions with `instrument` and installs
+# `trace_statement` as a statement tracer (sqlite3's set_trace_callback).
+# Per call this costs two perf_counter() reads and a dict update; per SQL
+# statement one list append. The first MAX_SLOWEST_STATEMENTS statements of
+# each function's slowest call are kept so the page can show them with
+# EXPLAIN QUERY PLAN.
+ENABLED = True
+MAX_PAGE_SAMPLES = 100
+MAX_SLOWEST_STATEMENTS = 50
+
+_lock = threading.Lock()
+_local = threading.local()
+_function_stats = {}
+_page_stats = {}
+
+def _frames():
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if result is None or isinstance(result, bool):
+        return 0
+    return 1
+
+def trace_statement(sql):
+    """Statement tracer: attribute a SQL statement to the running function and page."""
+    # SQLite also reports the statements it runs internally, such as FTS5
+    # reading its shadow tables, prefixed with "-- ". They are not queries
+    # the app made.
+    if sql.startswith('-- '):
+        return
+    frames = getattr(_local, 'frames', None)
+    if frames:
+        frames[-1].append(sql)
+    page = getattr(_local, 'page', None)
+    if page is not None:
+        page['queries'] += 1
+
+def instrument(func, name=None):
+    """Wrap a data-access function to record call count, latency, rows and SQL."""
+    name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        frames = _frames()
+        statements = []
+        frames.append(statements)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            frames.pop()
+            if frames:
+                # Statements of nested calls also belong to the caller.
+                frames[-1].extend(statements)
+        rows = _row_count(result)
+        with _lock:
+            stats = _function_stats.get(name)
+            if stats is None:
+                stats = _function_stats[name] = {
+                    'calls': 0, 'total': 0.0, 'max': 0.0, 'rows': 0, 'slowest_sql': [],
+                }
+            stats['calls'] += 1
+            stats['total'] += elapsed
+            stats['rows'] += rows
+            if elapsed >= stats['max']:
+                stats['max'] = elapsed
+                stats['slowest_sql'] = statements[:MAX_SLOWEST_STATEMENTS]
+        return result
+
+    return wrapper
+
+def instrument_functions(namespace, exclude=()):
+    """Instrument the public functions defined in a module namespace (e.g. globals())."""
+    module_name = namespace.get('__name__')
+    for name, value in list(namespace.items()):
+        if (name.startswith('_') or name in exclude or not inspect.isfunction(value)
+                or value.__module__ != module_name):
+            continue
+        namespace[name] = instrument(value, name)
+
+@contextmanager
+def page(name):
+    """Count the SQL statements run while rendering one dashboard page."""
+    previous = getattr(_local, 'page', None)
+    current = _local.page = {'queries': 0}
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.page = previous
+        elapsed = time.perf_counter() - start
+        with _lock:
+            stats = _page_stats.setdefault(name, {'renders': 0, 'queries': [], 'seconds': []})
+            stats['renders'] += 1
+            stats['queries'] = (stats['queries'] + [current['queries']])[-MAX_PAGE_SAMPLES:]
+            stats['seconds'] = (stats['seconds'] + [elapsed])[-MAX_PAGE_SAMPLES:]
+
+def get_function_stats():
+    """Per-function stats sorted by total time: name, calls, total_ms, avg_ms, max_ms, rows, slowest_sql."""
+    with _lock:
+        rows = [
+            {
+                'function': name,
+                'calls': stats['calls'],
+                'total_ms': stats['total'] * 1000,
+                'avg_ms': stats['total'] * 1000 / stats['calls'],
+                'max_ms': stats['max'] * 1000,
+                'rows': stats['rows'],
+                'slowest_sql': list(stats['slowest_sql']),
+            }
+            for name, stats in _function_stats.items()
+        ]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+def get_page_stats():
+    """Per-page query counts of recent reruns: last, average and max, plus average render time."""
+    with _lock:
+        rows = [
+            {
+                'page': name,
+                'renders': stats['renders'],
+                'last_queries': stats['queries'][-1],
+                'avg_queries': sum(stats['queries']) / len(stats['queries']),
+                'max_queries': max(stats['queries']),
+                'avg_render_ms': sum(stats['seconds']) * 1000 / len(stats['seconds']),
+            }
+            for name, stats in _page_stats.items()
+        ]
+    return sorted(rows, key=lambda row: row['page'])
+
+def reset():
+    with _lock:
+        _function_stats.clear()
+        _page_stats.clear()
+
+def explain_query_plan(conn, sql):
+    """EXPLAIN QUERY PLAN rows for a traced statement, or None for statements that have no plan."""
+    if sql.lstrip().split(None, 1)[0].upper() not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+        return None
+    return conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
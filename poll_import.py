@@ -0,0 +1,117 @@
+# poll_import.py
+
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+import database
+from poll_index import POLL_TYPES
+
+# Bulk poll import from CSV or JSONL.
+#
+# CSV files need a header row with the columns poll_question, is_public,
+# creator_id, group_id, start_time, end_time and options, where options are
+# separated by "|", plus an optional poll_type ('single' or 'ranked'). JSONL
+# files hold one object per line with the same keys and options as a list.
+# Times use the 'YYYY-MM-DD HH:MM:SS' format.
+DEFAULT_BATCH_SIZE = 500
+OPTION_SEPARATOR = '|'
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip())
+
+def parse_poll(record, line_number, default_creator_id=None):
+    """Validate one CSV/JSONL record and turn it into create_poll_with_options kwargs."""
+    try:
+        options = record.get('options') or []
+        if isinstance(options, str):
+            options = options.split(OPTION_SEPARATOR)
+        options = [str(option).strip() for option in options if str(option).strip()]
+        group_id = record.get('group_id')
+        creator_id = record.get('creator_id') or default_creator_id
+        poll = {
+            'poll_question': str(record['poll_question']).strip(),
+            'is_public': _parse_bool(record.get('is_public', True)),
+            'creator_id': int(creator_id),
+            'group_id': int(group_id) if group_id not in (None, '') else None,
+            'start_time': _parse_time(record['start_time']),
+            'end_time': _parse_time(record['end_time']),
+            'options': options,
+            'poll_type': str(record.get('poll_type') or 'single').strip().lower(),
+        }
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"Line {line_number}: invalid poll record ({error!r})") from error
+
+    if not poll['poll_question']:
+        raise ValueError(f"Line {line_number}: poll_question is empty")
+    if len(poll['options']) < 2:
+        raise ValueError(f"Line {line_number}: a poll needs at least two options")
+    if len(set(poll['options'])) != len(poll['options']):
+        raise ValueError(f"Line {line_number}: options must all be different")
+    if poll['start_time'] >= poll['end_time']:
+        raise ValueError(f"Line {line_number}: end_time must be after start_time")
+    if poll['poll_type'] not in POLL_TYPES:
+        raise ValueError(f"Line {line_number}: unknown poll_type {poll['poll_type']!r}")
+    if not poll['is_public'] and poll['group_id'] is None:
+        raise ValueError(f"Line {line_number}: private polls need a group_id")
+    return poll
+
+def read_polls(path, file_format=None, default_creator_id=None):
+    """Yield parsed polls from a CSV or JSONL file without loading it all into memory."""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            # Line 1 is the header.
+            for line_number, record in enumerate(csv.DictReader(f), start=2):
+                yield parse_poll(record, line_number, default_creator_id)
+        elif file_format in ('jsonl', 'ndjson', 'json'):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield parse_poll(json.loads(line), line_number, default_creator_id)
+        else:
+            raise ValueError(f"Unsupported import format: {file_format!r}")
+
+def import_polls(polls, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Insert polls in batched transactions. Calls progress(imported_so_far) after each batch.
+
+    Returns the number of polls imported. A failing batch is rolled back as a
+    whole and the error propagates; earlier batches stay committed.
+    """
+    polls = iter(polls)
+    imported = 0
+    while True:
+        batch = list(islice(polls, batch_size))
+        if not batch:
+            return imported
+        database.create_polls_bulk(batch)
+        imported += len(batch)
+        if progress:
+            progress(imported)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import polls and their options from CSV or JSONL.")
+    parser.add_argument('path', help="CSV or JSONL file to import.")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format (defaults to the file extension).")
+    parser.add_argument('--db', default=database.DB_NAME, help="Database file to import into.")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--creator-id', type=int, help="creator_id for records that do not set one.")
+    args = parser.parse_args()
+
+    database.DB_NAME = args.db
+    database.init_db()
+    polls = read_polls(args.path, args.format, args.creator_id)
+    total = import_polls(polls, args.batch_size, progress=lambda count: print(f"Imported {count} polls..."))
+    print(f"Done. Imported {total} polls.")
+
+if __name__ == '__main__':
+    main()
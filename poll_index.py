@@ -0,0 +1,92 @@
+# poll_index.py
+
+import calendar
+import threading
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(dt):
+    """Convert a naive datetime to integer seconds since 1970-01-01 on the same wall clock.
+
+    Poll times are naive local times, so they are stored as "wall-clock
+    epochs". These match SQLite's strftime('%s', <poll time text>).
+    """
+    return calendar.timegm(dt.timetuple())
+
+def from_epoch(timestamp):
+    return EPOCH + timedelta(seconds=timestamp)
+
+# Poll types: one Votes row per voter, or one RankedBallots row per voter.
+POLL_TYPES = {
+    'single': "Single choice",
+    'ranked': "Ranked choice",
+}
+
+# Columns of a Polls row, in table order.
+POLL_COLUMNS = ('poll_id', 'poll_question', 'is_public', 'creator_id', 'group_id', 'start_time', 'end_time',
+                'start_ts', 'end_ts', 'is_closed', 'poll_type')
+
+def poll_to_dict(poll):
+    """A Polls row as a dict, with is_public and is_closed as bools."""
+    return {
+        'poll_id': poll[0],
+        'poll_question': poll[1],
+        'is_public': bool(poll[2]),
+        'creator_id': poll[3],
+        'group_id': poll[4],
+        'start_time': poll[5],
+        'end_time': poll[6],
+        'start_ts': poll[7],
+        'end_ts': poll[8],
+        'is_closed': bool(poll[9]),
+        'poll_type': poll[10],
+    }
+
+class LivePollIndex:
+    """Answers "which polls are live at time t" from a sorted list of open/close events.
+
+    A poll is live while start_ts <= t <= end_ts. The index remembers how far
+    it has swept through the events, so a query at a later time only applies
+    the events in between: O(log n + events crossed + k) for k live polls.
+    Going back in time restarts the sweep.
+    """
+
+    def __init__(self, polls, built_at=None):
+        """`polls` is an iterable of (poll_id, start_ts, end_ts, row) tuples."""
+        self.built_at = built_at
+        events = []
+        for poll_id, start_ts, end_ts, row in polls:
+            if start_ts is None or end_ts is None or start_ts > end_ts:
+                continue
+            events.append((start_ts, True, poll_id, row))
+            events.append((end_ts + 1, False, poll_id, row))
+        events.sort(key=lambda event: event[0])
+        self._events = events
+        self._times = [event[0] for event in events]
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._position = 0
+        self._time = None
+        self._live = {}
+
+    def __len__(self):
+        return len(self._events) // 2
+
+    def live_at(self, timestamp):
+        """Return the rows of polls live at `timestamp`, ordered by poll_id."""
+        with self._lock:
+            if self._time is not None and timestamp < self._time:
+                self._reset()
+            target = bisect_right(self._times, timestamp)
+            for _, is_open, poll_id, row in self._events[self._position:target]:
+                if is_open:
+                    self._live[poll_id] = row
+                else:
+                    self._live.pop(poll_id, None)
+            self._position = target
+            self._time = timestamp
+            return [self._live[poll_id] for poll_id in sorted(self._live)]
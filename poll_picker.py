@@ -0,0 +1,66 @@
+# poll_picker.py
+
+import streamlit as st
+from repository import get_repository
+
+# Search box, filters and a paged poll list for the monitor pages. Only one
+# page of matches is fetched per rerun instead of every poll in the table.
+POLLS_PAGE_SIZE = 20
+
+STATUS_FILTERS = {
+    "All": None,
+    "Live": 'live',
+    "Ended": 'ended',
+    "Upcoming": 'upcoming',
+}
+
+VISIBILITY_FILTERS = {
+    "All": None,
+    "Public": True,
+    "Group": False,
+}
+
+def select_poll(key, group_id=None, creators=None):
+    """Render the poll picker and return the selected poll_id, or None.
+
+    creators maps usernames to user_ids for the creator filter; the filter
+    is hidden when it is None. With group_id set only that group's polls are
+    searched and the visibility filter is hidden.
+    """
+    query = st.text_input("Search polls:", key=f"{key}_query")
+    columns = st.columns(1 + (group_id is None) + (creators is not None))
+    status = STATUS_FILTERS[columns[0].selectbox("Status", list(STATUS_FILTERS), key=f"{key}_status")]
+    is_public = None
+    if group_id is None:
+        is_public = VISIBILITY_FILTERS[columns[1].selectbox("Visibility", list(VISIBILITY_FILTERS), key=f"{key}_visibility")]
+    creator_id = None
+    if creators is not None:
+        creator = columns[-1].selectbox("Creator", ["Anyone"] + list(creators), key=f"{key}_creator")
+        creator_id = creators.get(creator)
+
+    # Start from the first page whenever the search changes.
+    filters = (query, status, is_public, creator_id)
+    state = st.session_state.get(f"{key}_search")
+    if state is None or state['filters'] != filters:
+        state = st.session_state[f"{key}_search"] = {'filters': filters, 'page': 0}
+
+    polls, has_more = get_repository().search_polls(query, status=status, is_public=is_public, creator_id=creator_id,
+                                                    group_id=group_id, page=state['page'], page_size=POLLS_PAGE_SIZE)
+    if not polls:
+        if state['page'] == 0 and filters == ('', None, None, None):
+            st.info("No polls available.")
+        else:
+            st.info("No polls match your search.")
+        return None
+
+    selected_poll = st.selectbox("Select a poll to monitor:", polls,
+                                 format_func=lambda poll: f"{poll[0]}: {poll[1]}", key=f"{key}_poll")
+    previous_col, page_col, next_col = st.columns([1, 2, 1])
+    if previous_col.button("Previous", disabled=state['page'] == 0, key=f"{key}_previous"):
+        state['page'] -= 1
+        st.rerun()
+    page_col.caption(f"Page {state['page'] + 1}")
+    if next_col.button("Next", disabled=not has_more, key=f"{key}_next"):
+        state['page'] += 1
+        st.rerun()
+    return selected_poll[0]
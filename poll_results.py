@@ -0,0 +1,45 @@
+# poll_results.py
+
+import streamlit as st
+import pandas as pd
+from datetime import timedelta
+from poll_index import from_epoch
+
+def show_ranked_results(results):
+    """Round-by-round instant-runoff results, as returned by database.get_ranked_choice_results."""
+    if results['total_ballots'] == 0:
+        st.info("No ballots have been cast in this poll yet.")
+        return
+    if results['winner'] is not None:
+        st.success(f"Winner: {results['winner']}")
+    else:
+        st.info("No winner: every ballot was exhausted.")
+
+    # One column per round; an option's cells end when it is eliminated.
+    table = {}
+    for number, round_result in enumerate(results['rounds'], start=1):
+        for option_text, votes in round_result['counts']:
+            table.setdefault(option_text, {})[f"Round {number}"] = votes
+    df = pd.DataFrame.from_dict(table, orient='index')
+    st.bar_chart(df.iloc[:, -1].dropna().rename("Votes"))
+    st.table(df.astype('Int64').astype(str).replace('<NA>', ''))
+
+    for number, round_result in enumerate(results['rounds'], start=1):
+        eliminated = f"{round_result['eliminated']} eliminated" if round_result['eliminated'] else "final round"
+        st.write(f"Round {number}: {eliminated}, {round_result['exhausted']} exhausted ballot(s)")
+    st.caption(f"{results['total_ballots']} ballot(s) in total.")
+
+TURNOUT_RESOLUTIONS = {
+    "Minute": timedelta(minutes=1),
+    "Hour": timedelta(hours=1),
+    "Day": timedelta(days=1),
+}
+
+def show_turnout(turnout, key):
+    """Votes over time, from database.get_vote_turnout. `key` keeps each page's resolution picker separate."""
+    if not turnout:
+        return
+    st.subheader("Turnout over time")
+    resolution = st.selectbox("Resolution:", list(TURNOUT_RESOLUTIONS), index=1, key=key)
+    df = pd.DataFrame([(from_epoch(bucket_ts), votes) for bucket_ts, votes in turnout], columns=["Time", "Votes"])
+    st.bar_chart(df.set_index("Time").resample(TURNOUT_RESOLUTIONS[resolution]).sum())
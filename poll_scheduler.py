@@ -0,0 +1,73 @@
+# poll_scheduler.py
+
+import logging
+import threading
+from datetime import datetime
+
+from poll_index import to_epoch
+from repository import get_repository
+
+# Background thread that closes polls when their end time passes. Closing
+# writes an immutable results snapshot (see database.close_poll), so result
+# pages for ended polls are a single primary-key read. Polls created or
+# moved while the thread sleeps are picked up within MAX_SLEEP_SECONDS.
+MAX_SLEEP_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+class PollScheduler(threading.Thread):
+    """Sleeps until the next poll closes, then freezes its results."""
+
+    def __init__(self, max_sleep=MAX_SLEEP_SECONDS):
+        super().__init__(name='poll-scheduler', daemon=True)
+        self.max_sleep = max_sleep
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def run(self):
+        # The first pass catches up on polls that ended while the app was down.
+        while not self._stopped:
+            try:
+                self.close_due_polls()
+                delay = self.seconds_until_next_close()
+            except Exception:
+                logger.exception("Poll scheduler pass failed")
+                delay = self.max_sleep
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def close_due_polls(self):
+        """Close every poll whose end time has passed. Returns the closed poll_ids."""
+        repo = get_repository()
+        poll_ids = repo.get_polls_due_for_close(to_epoch(datetime.now()))
+        for poll_id in poll_ids:
+            repo.close_poll(poll_id)
+        return poll_ids
+
+    def seconds_until_next_close(self):
+        next_close = get_repository().get_next_poll_close()
+        if next_close is None:
+            return self.max_sleep
+        # A poll is live through its end_ts second and closes right after it.
+        delay = next_close + 1 - to_epoch(datetime.now())
+        return min(self.max_sleep, max(delay, 0))
+
+    def wake(self):
+        """Re-check for due polls now, e.g. after creating or editing a poll."""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_poll_scheduler():
+    """Start the process-wide scheduler once; later calls return the running instance."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = PollScheduler()
+            _scheduler.start()
+        return _scheduler
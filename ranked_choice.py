@@ -0,0 +1,155 @@
+# ranked_choice.py
+
+from array import array
+
+import numpy as np
+
+# Instant-runoff tally for ranked-choice polls.
+#
+# Ballots are stored as blobs of native 32-bit option_ids, first choice
+# first. They are decoded together into one (ballots x ranks) matrix of
+# candidate indexes, and every round is a handful of array operations: a
+# bincount of each ballot's current choice, then re-pointing only the
+# ballots whose choice was just eliminated. Python only loops over rounds,
+# never over ballots.
+
+def encode_ranking(option_ids):
+    return array('i', option_ids).tobytes()
+
+def decode_ranking(blob):
+    ranking = array('i')
+    ranking.frombytes(blob)
+    return ranking.tolist()
+
+def ballot_matrix(rankings, option_ids):
+    """Decode ranking blobs into an int32 matrix of indexes into option_ids.
+
+    Rows are ballots, columns ranks. Short rows are padded with, and unknown
+    option_ids replaced by, len(option_ids): the "no candidate" index.
+    """
+    candidate_count = len(option_ids)
+    itemsize = array('i').itemsize
+    lengths = np.fromiter(map(len, rankings), dtype=np.int64, count=len(rankings)) // itemsize
+    width = int(lengths.max(initial=0))
+    matrix = np.full((len(rankings), width), candidate_count, dtype=np.int32)
+    if width == 0:
+        return matrix
+
+    flat = np.frombuffer(b''.join(rankings), dtype=np.intc)
+    # A poll's option_ids are close together, so map them through a lookup
+    # table spanning min..max id; the extra last slot catches unknown ids.
+    low = min(option_ids, default=0)
+    span = max(option_ids, default=0) - low + 1
+    lookup = np.full(span + 1, candidate_count, dtype=np.int32)
+    lookup[np.asarray(option_ids, dtype=np.int64) - low] = np.arange(candidate_count)
+    offsets = flat.astype(np.int64) - low
+    candidates = lookup[np.where((offsets >= 0) & (offsets < span), offsets, span)]
+
+    rows = np.repeat(np.arange(len(rankings)), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    matrix[rows, np.arange(flat.size) - starts] = candidates
+    return matrix
+
+def _next_choice(matrix, eliminated, rows, start):
+    """Rank position of the first continuing candidate at or after `start` for the given rows.
+
+    Exhausted ballots get matrix.shape[1].
+    """
+    sub = matrix[rows]
+    if sub.shape[1] == 0:
+        return np.zeros(len(rows), dtype=np.int64)
+    columns = np.arange(sub.shape[1])
+    continuing = ~eliminated[sub] & (columns >= start[:, None])
+    first = continuing.argmax(axis=1)
+    found = continuing[np.arange(len(rows)), first]
+    return np.where(found, first, sub.shape[1])
+
+def instant_runoff(matrix, candidate_count):
+    """Run instant-runoff on a ballot_matrix. Returns (winner index or None, rounds).
+
+    Each round is a dict with counts (votes per continuing candidate index),
+    exhausted (ballots with no continuing choice left) and eliminated (the
+    candidate index dropped after the round, None in the final round). The
+    round's leader wins with a majority of the non-exhausted ballots. Ties
+    for last place eliminate the candidate with fewer first-round votes,
+    then the one listed later.
+    """
+    ballot_count, width = matrix.shape
+    # Index candidate_count is "no candidate" and never continues.
+    eliminated = np.zeros(candidate_count + 1, dtype=bool)
+    eliminated[candidate_count] = True
+    padded = np.concatenate([matrix, np.full((ballot_count, 1), candidate_count, dtype=matrix.dtype)], axis=1)
+
+    everyone = np.arange(ballot_count)
+    position = _next_choice(matrix, eliminated, everyone, np.zeros(ballot_count, dtype=np.int64))
+    current = padded[everyone, position]
+
+    rounds = []
+    first_round = None
+    winner = None
+    while True:
+        counts = np.bincount(current, minlength=candidate_count + 1)[:candidate_count]
+        if first_round is None:
+            first_round = counts.copy()
+        continuing = np.flatnonzero(~eliminated[:candidate_count])
+        active = int(counts.sum())
+        round_result = {
+            'counts': {int(candidate): int(counts[candidate]) for candidate in continuing},
+            'exhausted': ballot_count - active,
+            'eliminated': None,
+        }
+        rounds.append(round_result)
+        if active == 0 or len(continuing) == 0:
+            break
+        leader = continuing[np.argmax(counts[continuing])]
+        if counts[leader] * 2 > active or len(continuing) == 1:
+            winner = int(leader)
+            break
+
+        # Lowest count, then fewest first-round votes, then listed last.
+        loser = int(min(continuing, key=lambda candidate: (counts[candidate], first_round[candidate], -candidate)))
+        round_result['eliminated'] = loser
+        eliminated[loser] = True
+        moved = np.flatnonzero(current == loser)
+        if len(moved):
+            position[moved] = _next_choice(matrix, eliminated, moved, position[moved] + 1)
+            current[moved] = padded[moved, position[moved]]
+    return winner, rounds
+
+def tally(option_ids, rankings):
+    """Instant-runoff result keyed by option_id: {'winner', 'rounds', 'total_ballots'}.
+
+    rounds are dicts of counts ({option_id: votes}), exhausted and eliminated.
+    """
+    winner, rounds = instant_runoff(ballot_matrix(rankings, option_ids), len(option_ids))
+    return {
+        'winner': option_ids[winner] if winner is not None else None,
+        'total_ballots': len(rankings),
+        'rounds': [
+            {
+                'counts': {option_ids[candidate]: votes for candidate, votes in round_result['counts'].items()},
+                'exhausted': round_result['exhausted'],
+                'eliminated': option_ids[round_result['eliminated']] if round_result['eliminated'] is not None else None,
+            }
+            for round_result in rounds
+        ],
+    }
+
+def tally_by_text(option_texts, rankings):
+    """tally() with options named by text. option_texts maps option_id to text, in option order.
+
+    Round counts become lists of (option_text, votes).
+    """
+    result = tally(list(option_texts), rankings)
+    return {
+        'winner': option_texts.get(result['winner']),
+        'total_ballots': result['total_ballots'],
+        'rounds': [
+            {
+                'counts': [(option_texts[option_id], votes) for option_id, votes in round_result['counts'].items()],
+                'exhausted': round_result['exhausted'],
+                'eliminated': option_texts.get(round_result['eliminated']),
+            }
+            for round_result in result['rounds']
+        ],
+    }
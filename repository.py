@@ -0,0 +1,745 @@
+# repository.py
+
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import closing
+from datetime import datetime, timezone
+
+import database
+import export
+import perf
+from migrations import TURNOUT_BUCKET_SECONDS
+from poll_index import POLL_COLUMNS, POLL_TYPES, LivePollIndex, poll_to_dict, to_epoch
+from ranked_choice import encode_ranking, tally_by_text
+
+# Storage interface used by the UI, the poll scheduler and the vote queue.
+#
+# SQLiteRepository is the app's database through the functions of
+# database.py. InMemoryRepository keeps everything in Python dicts with the
+# indexes the UI reads by; it needs no disk and suits tests, benchmarks and
+# trying out the UI on throwaway data. Pick one with STORAGE_BACKEND, or
+# install an instance with set_repository().
+STORAGE_BACKEND = 'sqlite'
+
+class Repository:
+    """Everything the UI reads and writes.
+
+    Method names, arguments and return values follow the functions of the
+    same name in database.py, which document the row shapes. Constraint
+    violations (a taken username or group name, a second ranked ballot)
+    raise sqlite3.IntegrityError in every backend.
+    """
+
+    def init_db(self):
+        raise NotImplementedError
+
+    # Users
+    def insert_user(self, username, password_hash, role):
+        raise NotImplementedError
+
+    def get_user_by_id(self, user_id):
+        raise NotImplementedError
+
+    def get_user_by_username(self, username):
+        raise NotImplementedError
+
+    def get_all_users(self):
+        raise NotImplementedError
+
+    def get_users_by_role(self, role):
+        raise NotImplementedError
+
+    def update_user_role(self, user_id, role):
+        raise NotImplementedError
+
+    def update_user_password_hash(self, user_id, password_hash):
+        raise NotImplementedError
+
+    def delete_user(self, user_id):
+        raise NotImplementedError
+
+    # Groups and memberships
+    def create_group(self, group_name, admin_user_id):
+        raise NotImplementedError
+
+    def get_group_by_name(self, group_name):
+        raise NotImplementedError
+
+    def get_group_id_by_admin(self, admin_user_id):
+        raise NotImplementedError
+
+    def get_all_groups(self):
+        raise NotImplementedError
+
+    def request_membership(self, group_id, user_id):
+        raise NotImplementedError
+
+    def update_group_member_statuses(self, group_id, member_ids, status):
+        raise NotImplementedError
+
+    def import_group_members(self, group_id, usernames, status='accepted'):
+        raise NotImplementedError
+
+    def get_group_members(self, group_id, status='accepted'):
+        raise NotImplementedError
+
+    def get_group_member_requests(self, group_id):
+        raise NotImplementedError
+
+    def get_group_member_count(self, group_id):
+        raise NotImplementedError
+
+    def delete_group_member(self, group_id, user_id):
+        raise NotImplementedError
+
+    # Polls
+    def create_poll_with_options(self, poll_question, is_public, creator_id, group_id, start_time, end_time,
+                                 options, poll_type='single'):
+        raise NotImplementedError
+
+    def get_poll_by_id(self, poll_id):
+        raise NotImplementedError
+
+    def get_current_polls_admin(self):
+        raise NotImplementedError
+
+    def get_current_polls_by_group(self, group_id):
+        raise NotImplementedError
+
+    def get_vote_feed(self, user_id):
+        raise NotImplementedError
+
+    def get_polls_user_can_see_results(self, user_id):
+        raise NotImplementedError
+
+    def search_polls(self, query='', status=None, is_public=None, creator_id=None, group_id=None,
+                     page=0, page_size=20, now=None):
+        raise NotImplementedError
+
+    # Votes and results
+    def cast_vote(self, poll_id, option_id, user_id):
+        raise NotImplementedError
+
+    def cast_votes(self, votes):
+        raise NotImplementedError
+
+    def cast_ranked_ballot(self, poll_id, user_id, option_ids):
+        raise NotImplementedError
+
+    def get_final_vote_counts(self, poll_id):
+        raise NotImplementedError
+
+    def get_ranked_choice_results(self, poll_id):
+        raise NotImplementedError
+
+    def get_vote_turnout(self, poll_id):
+        raise NotImplementedError
+
+    def get_dashboard_stats(self):
+        raise NotImplementedError
+
+    # Closing polls
+    def get_next_poll_close(self):
+        raise NotImplementedError
+
+    def get_polls_due_for_close(self, now_ts):
+        raise NotImplementedError
+
+    def close_poll(self, poll_id):
+        raise NotImplementedError
+
+    # Messages
+    def send_message(self, sender_id, receiver_id, message_text):
+        raise NotImplementedError
+
+    def get_messages_page(self, user_id1, user_id2, before_message_id=None, page_size=50):
+        raise NotImplementedError
+
+    def get_messages_since(self, user_id1, user_id2, last_message_id):
+        raise NotImplementedError
+
+    def search_messages(self, user_id, query, with_user_id=None, before_message_id=None, page_size=20,
+                        highlight=('**', '**')):
+        raise NotImplementedError
+
+    def get_table_generation(self, table):
+        raise NotImplementedError
+
+    # Diagnostics and exports. Backends without them keep these defaults.
+    def get_cache_stats(self):
+        """Statistics of the backend's caches, by cache name."""
+        return {}
+
+    def explain_query_plan(self, sql):
+        """(id, parent, notused, detail) rows of the query plan of `sql`, if the backend has plans."""
+        return []
+
+    def export_to_file(self, name, path, fmt='csv', **filters):
+        """Write one of the export.EXPORTS to `path`. Returns the row count."""
+        raise NotImplementedError(f"{type(self).__name__} does not support exports.")
+
+class SQLiteRepository(Repository):
+    """The SQLite database, through the functions of database.py."""
+
+    def get_cache_stats(self):
+        return {
+            'query_cache': database.get_cache_stats(),
+            'user_cache': database.user_cache.get_stats(),
+        }
+
+    def explain_query_plan(self, sql):
+        with closing(database.create_connection()) as conn:
+            return perf.explain_query_plan(conn, sql)
+
+    def export_to_file(self, name, path, fmt='csv', **filters):
+        return export.export_to_file(name, path, fmt, **filters)
+
+def _delegate(name):
+    # Look the function up on every call so DB_NAME changes and the perf
+    # instrumentation of database.py apply.
+    def method(self, *args, **kwargs):
+        return getattr(database, name)(*args, **kwargs)
+    method.__name__ = name
+    method.__qualname__ = f"SQLiteRepository.{name}"
+    method.__doc__ = getattr(database, name).__doc__
+    return method
+
+for _name, _member in list(vars(Repository).items()):
+    if callable(_member) and not _name.startswith('_') and _name not in vars(SQLiteRepository):
+        setattr(SQLiteRepository, _name, _delegate(_name))
+
+def _pair(user_id1, user_id2):
+    return (user_id1, user_id2) if user_id1 <= user_id2 else (user_id2, user_id1)
+
+class InMemoryRepository(Repository):
+    """All data in process memory, as dicts of rows shaped like the SQLite tables plus lookup indexes.
+
+    Nothing is persisted. Searches match words as case-insensitive
+    substrings, like the SQLite backend without FTS5. One lock serializes
+    all calls, so the scheduler and vote writer threads can share it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = {}
+        self._generations = {}
+
+        self._users = {}  # user_id -> (user_id, username, password_hash, role)
+        self._user_ids_by_name = {}
+
+        self._groups = {}  # group_id -> (group_id, group_name, admin_user_id)
+        self._group_ids_by_name = {}
+        self._group_ids_by_admin = {}  # admin_user_id -> [group_id, ...]
+        self._members = {}  # member_id -> (member_id, group_id, user_id, status)
+        self._member_ids_by_pair = {}  # (group_id, user_id) -> member_id
+        self._member_ids_by_group = {}  # group_id -> {member_id: None}, in insertion order
+        self._group_ids_by_user = {}  # user_id -> {group_id, ...} with any membership row
+
+        self._polls = {}  # poll_id -> Polls row tuple, see POLL_COLUMNS
+        self._poll_ids_by_group = {}
+        self._options = {}  # option_id -> (option_id, poll_id, option_text, vote_count)
+        self._option_ids_by_poll = {}
+        self._votes = {}  # vote_id -> (vote_id, poll_id, option_id, user_id, cast_at)
+        self._voters_by_poll = {}  # poll_id -> {user_id, ...} with a vote or a ranked ballot
+        self._ballots = {}  # poll_id -> {user_id: ranking blob}
+        self._turnout = {}  # poll_id -> {bucket_ts: votes}
+        self._voter_activity = {}  # user_id -> votes and ballots cast
+        self._poll_results = {}  # poll_id -> snapshot dict written by close_poll
+        self._live_index = None
+        self._live_index_generation = None
+
+        self._messages = {}  # message_id -> (message_id, sender_id, receiver_id, message_text, timestamp)
+        self._message_ids_by_pair = {}  # _pair(user_id1, user_id2) -> [message_id, ...] ascending
+        self._message_ids_by_user = {}  # user_id -> [message_id, ...] sent or received, ascending
+
+    def _next_id(self, table):
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    def _bump(self, *tables):
+        for table in tables:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+    def init_db(self):
+        pass
+
+    def get_table_generation(self, table):
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    # Users
+    def insert_user(self, username, password_hash, role):
+        with self._lock:
+            if username in self._user_ids_by_name:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: Users.username")
+            if role not in ('admin', 'group_admin', 'user'):
+                raise sqlite3.IntegrityError("CHECK constraint failed: role")
+            user_id = self._next_id('Users')
+            self._users[user_id] = (user_id, username, password_hash, role)
+            self._user_ids_by_name[username] = user_id
+            self._bump('Users')
+            return user_id
+
+    def get_user_by_id(self, user_id):
+        with self._lock:
+            return self._users.get(user_id)
+
+    def get_user_by_username(self, username):
+        with self._lock:
+            return self._users.get(self._user_ids_by_name.get(username))
+
+    def get_all_users(self):
+        with self._lock:
+            return [(user_id, username, role) for user_id, username, _, role in self._users.values()]
+
+    def get_users_by_role(self, role):
+        with self._lock:
+            return [user for user in self._users.values() if user[3] == role]
+
+    def _update_user(self, user_id, column, value):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None:
+                user = list(user)
+                user[column] = value
+                self._users[user_id] = tuple(user)
+            self._bump('Users')
+
+    def update_user_role(self, user_id, role):
+        self._update_user(user_id, 3, role)
+
+    def update_user_password_hash(self, user_id, password_hash):
+        self._update_user(user_id, 2, password_hash)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            user = self._users.pop(user_id, None)
+            if user is not None:
+                del self._user_ids_by_name[user[1]]
+            self._bump('Users')
+
+    # Groups and memberships
+    def create_group(self, group_name, admin_user_id):
+        with self._lock:
+            if group_name in self._group_ids_by_name:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: Groups.group_name")
+            group_id = self._next_id('Groups')
+            self._groups[group_id] = (group_id, group_name, admin_user_id)
+            self._group_ids_by_name[group_name] = group_id
+            self._group_ids_by_admin.setdefault(admin_user_id, []).append(group_id)
+            self._bump('Groups')
+            return group_id
+
+    def get_group_by_name(self, group_name):
+        with self._lock:
+            return self._groups.get(self._group_ids_by_name.get(group_name))
+
+    def get_group_id_by_admin(self, admin_user_id):
+        with self._lock:
+            group_ids = self._group_ids_by_admin.get(admin_user_id)
+            return group_ids[0] if group_ids else None
+
+    def get_all_groups(self):
+        with self._lock:
+            return list(self._groups.values())
+
+    def _set_membership(self, group_id, user_id, status):
+        """Insert or update the membership row of a user in a group."""
+        member_id = self._member_ids_by_pair.get((group_id, user_id))
+        if member_id is None:
+            member_id = self._next_id('GroupMembers')
+            self._member_ids_by_pair[(group_id, user_id)] = member_id
+            self._member_ids_by_group.setdefault(group_id, {})[member_id] = None
+            self._group_ids_by_user.setdefault(user_id, set()).add(group_id)
+        self._members[member_id] = (member_id, group_id, user_id, status)
+
+    def _membership_status(self, group_id, user_id):
+        member_id = self._member_ids_by_pair.get((group_id, user_id))
+        return self._members[member_id][3] if member_id is not None else None
+
+    def request_membership(self, group_id, user_id):
+        with self._lock:
+            if self._membership_status(group_id, user_id) not in (None, 'rejected'):
+                return False
+            self._set_membership(group_id, user_id, 'pending')
+            self._bump('GroupMembers')
+            return True
+
+    def update_group_member_statuses(self, group_id, member_ids, status):
+        with self._lock:
+            group_member_ids = self._member_ids_by_group.get(group_id, {})
+            changed = 0
+            for member_id in set(member_ids):
+                if member_id in group_member_ids:
+                    _, _, user_id, _ = self._members[member_id]
+                    self._members[member_id] = (member_id, group_id, user_id, status)
+                    changed += 1
+            self._bump('GroupMembers')
+            return changed
+
+    def import_group_members(self, group_id, usernames, status='accepted'):
+        with self._lock:
+            usernames = list(dict.fromkeys(name.strip() for name in usernames if name.strip()))
+            written = 0
+            for name in usernames:
+                user_id = self._user_ids_by_name.get(name)
+                if user_id is not None and self._membership_status(group_id, user_id) != status:
+                    self._set_membership(group_id, user_id, status)
+                    written += 1
+            self._bump('GroupMembers')
+            return written, [name for name in usernames if name not in self._user_ids_by_name]
+
+    def _group_rows(self, group_id, status):
+        for member_id in self._member_ids_by_group.get(group_id, {}):
+            member = self._members[member_id]
+            user = self._users.get(member[2])
+            if member[3] == status and user is not None:
+                yield member, user
+
+    def get_group_members(self, group_id, status='accepted'):
+        with self._lock:
+            return [(user[0], user[1]) for _, user in self._group_rows(group_id, status)]
+
+    def get_group_member_requests(self, group_id):
+        with self._lock:
+            return [(member[0], user[0], user[1]) for member, user in self._group_rows(group_id, 'pending')]
+
+    def get_group_member_count(self, group_id):
+        with self._lock:
+            return sum(1 for member_id in self._member_ids_by_group.get(group_id, {})
+                       if self._members[member_id][3] == 'accepted')
+
+    def delete_group_member(self, group_id, user_id):
+        with self._lock:
+            member_id = self._member_ids_by_pair.pop((group_id, user_id), None)
+            if member_id is not None:
+                del self._members[member_id]
+                del self._member_ids_by_group[group_id][member_id]
+                self._group_ids_by_user[user_id].discard(group_id)
+            self._bump('GroupMembers')
+
+    def _accepted_group_ids(self, user_id):
+        return {group_id for group_id in self._group_ids_by_user.get(user_id, ())
+                if self._membership_status(group_id, user_id) == 'accepted'}
+
+    # Polls
+    def create_poll_with_options(self, poll_question, is_public, creator_id, group_id, start_time, end_time,
+                                 options, poll_type='single'):
+        with self._lock:
+            if poll_type not in POLL_TYPES:
+                raise sqlite3.IntegrityError("CHECK constraint failed: poll_type")
+            if len(set(options)) != len(options):
+                raise ValueError("Poll options must all be different.")
+            poll_id = self._next_id('Polls')
+            self._polls[poll_id] = (
+                poll_id, poll_question, int(is_public), creator_id, group_id,
+                start_time.strftime('%Y-%m-%d %H:%M:%S'), end_time.strftime('%Y-%m-%d %H:%M:%S'),
+                to_epoch(start_time), to_epoch(end_time), 0, poll_type,
+            )
+            self._poll_ids_by_group.setdefault(group_id, []).append(poll_id)
+            option_ids = self._option_ids_by_poll.setdefault(poll_id, [])
+            for option_text in options:
+                option_id = self._next_id('Options')
+                self._options[option_id] = (option_id, poll_id, option_text, 0)
+                option_ids.append(option_id)
+            self._bump('Polls', 'Options')
+            return poll_id
+
+    def get_poll_by_id(self, poll_id):
+        with self._lock:
+            poll = self._polls.get(poll_id)
+        return poll_to_dict(poll) if poll is not None else None
+
+    def _live_polls(self, now_ts=None):
+        """Polls rows live at now_ts, ordered by poll_id, from a LivePollIndex rebuilt after poll writes."""
+        if now_ts is None:
+            now_ts = to_epoch(datetime.now())
+        with self._lock:
+            index = self._live_index
+            generation = self.get_table_generation('Polls')
+            if index is None or self._live_index_generation != generation or now_ts < index.built_at:
+                index = self._live_index = LivePollIndex(
+                    ((poll[0], poll[7], poll[8], poll) for poll in self._polls.values() if poll[8] >= now_ts),
+                    built_at=now_ts,
+                )
+                self._live_index_generation = generation
+        return index.live_at(now_ts)
+
+    def get_current_polls_admin(self):
+        return [poll_to_dict(poll) for poll in self._live_polls()]
+
+    def get_current_polls_by_group(self, group_id):
+        return [poll_to_dict(poll) for poll in self._live_polls() if poll[4] == group_id]
+
+    def get_vote_feed(self, user_id):
+        live_polls = self._live_polls()
+        with self._lock:
+            group_ids = self._accepted_group_ids(user_id)
+            polls = [poll for poll in live_polls if poll[2] or poll[4] in group_ids]
+            polls.sort(key=lambda poll: (not poll[2], poll[0]))
+            return [
+                {
+                    'poll_id': poll[0],
+                    'poll_question': poll[1],
+                    'is_public': bool(poll[2]),
+                    'start_time': poll[5],
+                    'end_time': poll[6],
+                    'poll_type': poll[10],
+                    'has_voted': user_id in self._voters_by_poll.get(poll[0], ()),
+                    'options': [(option_id, self._options[option_id][2]) for option_id in self._option_ids_by_poll[poll[0]]],
+                }
+                for poll in polls
+            ]
+
+    def get_polls_user_can_see_results(self, user_id):
+        with self._lock:
+            public_polls = [poll for poll in self._polls.values() if poll[2]]
+            private_polls = [
+                self._polls[poll_id]
+                for group_id in sorted(self._accepted_group_ids(user_id))
+                for poll_id in self._poll_ids_by_group.get(group_id, ())
+                if not self._polls[poll_id][2]
+            ]
+            return [dict(zip(POLL_COLUMNS, poll)) for poll in public_polls + private_polls]
+
+    def search_polls(self, query='', status=None, is_public=None, creator_id=None, group_id=None,
+                     page=0, page_size=20, now=None):
+        now_ts = to_epoch(now or datetime.now())
+        if status not in (None, 'live', 'ended', 'upcoming'):
+            raise ValueError(f"Unknown poll status: {status}")
+        terms = [term.lower() for term in query.split()]
+
+        def matches(poll):
+            if status == 'live' and not poll[7] <= now_ts <= poll[8]:
+                return False
+            if status == 'ended' and not poll[8] < now_ts:
+                return False
+            if status == 'upcoming' and not poll[7] > now_ts:
+                return False
+            if is_public is not None and poll[2] != int(is_public):
+                return False
+            if creator_id is not None and poll[3] != creator_id:
+                return False
+            if group_id is not None and poll[4] != group_id:
+                return False
+            question = poll[1].lower()
+            return all(term in question for term in terms)
+
+        with self._lock:
+            polls = self._polls.values() if group_id is None else (
+                self._polls[poll_id] for poll_id in self._poll_ids_by_group.get(group_id, ()))
+            # Newest first; stop as soon as the page and one extra row are found.
+            skip, polls_page = page * page_size, []
+            for poll in sorted(polls, key=lambda poll: poll[0], reverse=True):
+                if not matches(poll):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                polls_page.append(poll)
+                if len(polls_page) > page_size:
+                    break
+            return polls_page[:page_size], len(polls_page) > page_size
+
+    # Votes and results
+    def _record_participation(self, poll_id, user_id, cast_at):
+        self._voters_by_poll.setdefault(poll_id, set()).add(user_id)
+        self._voter_activity[user_id] = self._voter_activity.get(user_id, 0) + 1
+        bucket_ts = cast_at // TURNOUT_BUCKET_SECONDS * TURNOUT_BUCKET_SECONDS
+        turnout = self._turnout.setdefault(poll_id, {})
+        turnout[bucket_ts] = turnout.get(bucket_ts, 0) + 1
+
+    def _insert_vote(self, poll_id, option_id, user_id, cast_at):
+        vote_id = self._next_id('Votes')
+        self._votes[vote_id] = (vote_id, poll_id, option_id, user_id, cast_at)
+        option = self._options.get(option_id)
+        if option is not None:
+            self._options[option_id] = option[:3] + (option[3] + 1,)
+        self._record_participation(poll_id, user_id, cast_at)
+        return vote_id
+
+    def cast_vote(self, poll_id, option_id, user_id):
+        with self._lock:
+            vote_id = self._insert_vote(poll_id, option_id, user_id, to_epoch(datetime.now()))
+            self._bump('Votes', 'Options')
+            return vote_id
+
+    def cast_votes(self, votes):
+        with self._lock:
+            cast_at = to_epoch(datetime.now())
+            vote_ids = [self._insert_vote(poll_id, option_id, user_id, cast_at)
+                        for poll_id, option_id, user_id in votes]
+            self._bump('Votes', 'Options')
+            return vote_ids
+
+    def cast_ranked_ballot(self, poll_id, user_id, option_ids):
+        option_ids = [int(option_id) for option_id in option_ids]
+        if not option_ids or len(set(option_ids)) != len(option_ids):
+            raise ValueError("A ranking must list at least one option, each at most once.")
+        with self._lock:
+            poll = self._polls.get(poll_id)
+            if poll is None or poll[10] != 'ranked':
+                raise ValueError(f"Poll {poll_id} is not a ranked-choice poll.")
+            if not set(option_ids) <= set(self._option_ids_by_poll[poll_id]):
+                raise ValueError(f"The ranking names options that are not in poll {poll_id}.")
+            ballots = self._ballots.setdefault(poll_id, {})
+            if user_id in ballots:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: RankedBallots.poll_id, RankedBallots.user_id")
+            ballots[user_id] = encode_ranking(option_ids)
+            self._record_participation(poll_id, user_id, to_epoch(datetime.now()))
+            self._bump('RankedBallots')
+            return self._next_id('RankedBallots')
+
+    def _vote_counts(self, poll_id):
+        return [self._options[option_id][2:] for option_id in self._option_ids_by_poll.get(poll_id, ())]
+
+    def _ranked_choice_results(self, poll_id):
+        option_texts = {option_id: self._options[option_id][2] for option_id in self._option_ids_by_poll[poll_id]}
+        return tally_by_text(option_texts, list(self._ballots.get(poll_id, {}).values()))
+
+    def get_final_vote_counts(self, poll_id):
+        with self._lock:
+            snapshot = self._poll_results.get(poll_id)
+            if snapshot is None:
+                return self._vote_counts(poll_id)
+            return [(option_text, count) for option_text, count, _ in snapshot['results']]
+
+    def get_ranked_choice_results(self, poll_id):
+        with self._lock:
+            snapshot = self._poll_results.get(poll_id)
+            if snapshot is not None and snapshot['ranked_results'] is not None:
+                return snapshot['ranked_results']
+            return self._ranked_choice_results(poll_id)
+
+    def get_vote_turnout(self, poll_id):
+        with self._lock:
+            return sorted(self._turnout.get(poll_id, {}).items())
+
+    def get_dashboard_stats(self):
+        with self._lock:
+            return {
+                'total_users': len(self._users),
+                'total_groups': len(self._groups),
+                'total_polls': len(self._polls),
+                'active_voters': len(self._voter_activity),
+            }
+
+    # Closing polls
+    def get_next_poll_close(self):
+        with self._lock:
+            return min((poll[8] for poll in self._polls.values() if not poll[9]), default=None)
+
+    def get_polls_due_for_close(self, now_ts):
+        with self._lock:
+            return [poll[0] for poll in self._polls.values() if not poll[9] and poll[8] < now_ts]
+
+    def close_poll(self, poll_id):
+        with self._lock:
+            poll = self._polls.get(poll_id)
+            if poll is None:
+                return
+            ranked_results = None
+            if poll[10] == 'ranked':
+                # First preferences stand in for the single-choice counts.
+                ranked_results = self._ranked_choice_results(poll_id)
+                counts = ranked_results['rounds'][0]['counts']
+            else:
+                counts = self._vote_counts(poll_id)
+            total_votes = sum(count for _, count in counts)
+            self._poll_results[poll_id] = {
+                'total_votes': total_votes,
+                'results': [
+                    (option_text, count, (count / total_votes) * 100 if total_votes else 0.0)
+                    for option_text, count in counts
+                ],
+                'closed_at': to_epoch(datetime.now()),
+                'ranked_results': ranked_results,
+            }
+            self._polls[poll_id] = poll[:9] + (1,) + poll[10:]
+            self._bump('Polls', 'PollResults')
+
+    # Messages
+    def send_message(self, sender_id, receiver_id, message_text):
+        with self._lock:
+            message_id = self._next_id('Messages')
+            timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self._messages[message_id] = (message_id, sender_id, receiver_id, message_text, timestamp)
+            self._message_ids_by_pair.setdefault(_pair(sender_id, receiver_id), []).append(message_id)
+            self._message_ids_by_user.setdefault(sender_id, []).append(message_id)
+            if receiver_id != sender_id:
+                self._message_ids_by_user.setdefault(receiver_id, []).append(message_id)
+            self._bump('Messages')
+            return message_id
+
+    def _message_row(self, message_id):
+        """Messages row followed by the sender's username, as in get_messages_page."""
+        message = self._messages[message_id]
+        sender = self._users.get(message[1])
+        return message + (sender[1] if sender is not None else None,)
+
+    def get_messages_page(self, user_id1, user_id2, before_message_id=None, page_size=50):
+        with self._lock:
+            message_ids = self._message_ids_by_pair.get(_pair(user_id1, user_id2), [])
+            end = len(message_ids) if before_message_id is None else bisect_left(message_ids, before_message_id)
+            start = max(end - page_size, 0)
+            return [self._message_row(message_id) for message_id in message_ids[start:end]], start > 0
+
+    def get_messages_since(self, user_id1, user_id2, last_message_id):
+        with self._lock:
+            message_ids = self._message_ids_by_pair.get(_pair(user_id1, user_id2), [])
+            return [self._message_row(message_id)
+                    for message_id in message_ids[bisect_right(message_ids, last_message_id):]]
+
+    def search_messages(self, user_id, query, with_user_id=None, before_message_id=None, page_size=20,
+                        highlight=('**', '**')):
+        terms = [term.lower() for term in query.split()]
+        if not terms:
+            return [], False
+        with self._lock:
+            if with_user_id is None:
+                message_ids = self._message_ids_by_user.get(user_id, [])
+            else:
+                message_ids = self._message_ids_by_pair.get(_pair(user_id, with_user_id), [])
+            end = len(message_ids) if before_message_id is None else bisect_left(message_ids, before_message_id)
+            results = []
+            for position in range(end - 1, -1, -1):
+                message_id, sender_id, receiver_id, message_text, timestamp = self._messages[message_ids[position]]
+                text = message_text.lower()
+                if not all(term in text for term in terms):
+                    continue
+                other_user_id = receiver_id if sender_id == user_id else sender_id
+                other_user = self._users.get(other_user_id)
+                results.append({
+                    'message_id': message_id,
+                    'sender_id': sender_id,
+                    'other_user_id': other_user_id,
+                    'other_username': other_user[1] if other_user is not None else None,
+                    'timestamp': timestamp,
+                    'snippet': message_text,
+                })
+                if len(results) > page_size:
+                    break
+            return results[:page_size], len(results) > page_size
+
+BACKENDS = {
+    'sqlite': SQLiteRepository,
+    'memory': InMemoryRepository,
+}
+
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_repository():
+    """Return the process-wide repository, creating a STORAGE_BACKEND one on first use."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = BACKENDS[STORAGE_BACKEND]()
+        return _repository
+
+def set_repository(repository):
+    """Route all storage through `repository` from now on, e.g. an InMemoryRepository in a benchmark."""
+    global _repository
+    with _repository_lock:
+        _repository = repository
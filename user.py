@@ -1,74 +1,80 @@
 # user.py
 
 import streamlit as st
-from database import (
-    get_current_polls,
-    get_options_by_poll,
-    has_user_voted,
-    cast_vote,
-    get_vote_counts,
-    add_group_member,
-    get_group_by_name,
-    get_group_members,
-    get_group_member_requests,
-    get_polls_user_can_see_results
-)
+from poll_index import to_epoch
+from repository import get_repository
 from datetime import datetime
 from auth import logout
+from vote_queue import submit_vote
+from poll_results import show_ranked_results
+from perf import page
 
 def user_dashboard():
     st.sidebar.title("User Dashboard")
     menu = ["Vote", "See Results", "Join a Group", "Logout"]
     choice = st.sidebar.selectbox("Menu", menu)
 
-    if choice == "Vote":
-        vote()
-    elif choice == "See Results":
-        see_results()
-    elif choice == "Join a Group":
-        join_group()
-    elif choice == "Logout":
-        logout()
-    else:
-        st.subheader("Welcome to the User Dashboard")
+    with page(f"user/{choice}"):
+        if choice == "Vote":
+            vote()
+        elif choice == "See Results":
+            see_results()
+        elif choice == "Join a Group":
+            join_group()
+        elif choice == "Logout":
+            logout()
+        else:
+            st.subheader("Welcome to the User Dashboard")
 
 def vote():
     st.header("Available Polls")
     user_id = st.session_state.get('user_id')
-    polls = get_current_polls(user_id)
+    polls = get_repository().get_vote_feed(user_id)
 
     if polls:
         for poll in polls:
-            poll_id = poll[0]
-            poll_question = poll[1]
-            is_public = poll[2]
-            start_time = poll[5]
-            end_time = poll[6]
+            poll_id = poll['poll_id']
 
-            st.subheader(f"Poll: {poll_question}")
-            st.write(f"Start Time: {start_time}")
-            st.write(f"End Time: {end_time}")
+            st.subheader(f"Poll: {poll['poll_question']}")
+            st.write(f"Start Time: {poll['start_time']}")
+            st.write(f"End Time: {poll['end_time']}")
 
-            if has_user_voted(poll_id, user_id):
+            if poll['has_voted']:
                 st.info("You have already voted in this poll.")
+            elif poll['poll_type'] == 'ranked':
+                ranked_ballot(poll, user_id)
             else:
-                options = get_options_by_poll(poll_id)
-                option_texts = [option[2] for option in options]
-                option_ids = [option[0] for option in options]
+                option_ids = [option[0] for option in poll['options']]
+                option_texts = [option[1] for option in poll['options']]
                 selected_option = st.radio("Choose an option:", option_texts, key=f"poll_{poll_id}")
 
                 if st.button("Submit Vote", key=f"vote_{poll_id}"):
                     option_index = option_texts.index(selected_option)
                     selected_option_id = option_ids[option_index]
-                    cast_vote(poll_id, selected_option_id, user_id)
+                    # Wait until the vote is committed, even when votes are batched.
+                    submit_vote(poll_id, selected_option_id, user_id).result()
                     st.success("Your vote has been recorded.")
     else:
         st.info("No available polls at this time.")
 
+def ranked_ballot(poll, user_id):
+    option_ids = {option_text: option_id for option_id, option_text in poll['options']}
+    # The multiselect keeps the order in which options are picked.
+    ranking = st.multiselect("Rank the options, your first choice first:", list(option_ids),
+                             key=f"poll_{poll['poll_id']}")
+    if st.button("Submit Ballot", key=f"vote_{poll['poll_id']}"):
+        if ranking:
+            get_repository().cast_ranked_ballot(poll['poll_id'], user_id,
+                                                [option_ids[option_text] for option_text in ranking])
+            st.success("Your ballot has been recorded.")
+        else:
+            st.warning("Please rank at least one option.")
+
 def see_results():
+    repo = get_repository()
     st.header("Poll Results")
     user_id = st.session_state.get('user_id')
-    polls = get_polls_user_can_see_results(user_id)
+    polls = repo.get_polls_user_can_see_results(user_id)
 
     if polls:
         # Build poll options for selectbox
@@ -81,14 +87,13 @@ def see_results():
 
         if selected_poll:
             end_time_str = selected_poll['end_time']
-            # Convert end_time_str to datetime object
-            end_time = datetime.strptime(end_time_str, '%Y-%m-%d %H:%M:%S')
-
-            now = datetime.now()
 
-            if end_time <= now:
-                # Poll has ended, show results
-                results = get_vote_counts(selected_poll_id)
+            if selected_poll['end_ts'] <= to_epoch(datetime.now()) and selected_poll['poll_type'] == 'ranked':
+                st.subheader("Results")
+                show_ranked_results(repo.get_ranked_choice_results(selected_poll_id))
+            elif selected_poll['end_ts'] <= to_epoch(datetime.now()):
+                # Poll has ended, show results (frozen once the scheduler closes it)
+                results = repo.get_final_vote_counts(selected_poll_id)
                 if results:
                     option_texts = [result[0] for result in results]
                     vote_counts = [result[1] for result in results]
@@ -113,22 +118,17 @@ def see_results():
     else:
         st.info("No available polls to display.")
 def join_group():
+    repo = get_repository()
     st.header("Join a Group")
     group_name = st.text_input("Enter the name of the group you want to join:")
     if st.button("Request to Join"):
-        group = get_group_by_name(group_name)
+        group = repo.get_group_by_name(group_name)
         if group:
             group_id = group[0]
             user_id = st.session_state.get('user_id')
-            # Check if the user is already a member or has a pending request
-            current_members = get_group_members(group_id, status='accepted')
-            pending_members = get_group_members(group_id, status='pending')
-            member_ids = [member[0] for member in current_members + pending_members]
-
-            if user_id in member_ids:
-                st.info("You have already requested to join this group or are already a member.")
-            else:
-                add_group_member(group_id, user_id, status='pending')
+            if repo.request_membership(group_id, user_id):
                 st.success("Your request to join the group has been sent.")
+            else:
+                st.info("You have already requested to join this group or are already a member.")
         else:
             st.error("Group not found.")
\ No newline at end of file
@@ -1,9 +1,112 @@
 # utils.py
 
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+# Password hashing. bcrypt runs on a small, bounded thread pool, so a wave of
+# logins when a poll opens queues up here instead of occupying every
+# Streamlit script thread with CPU-bound hashing at once.
+BCRYPT_ROUNDS = 12
+HASH_WORKERS = 4
+
+class PasswordHasher:
+    """bcrypt on a bounded thread pool, with latency and queue-depth statistics."""
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, max_workers=HASH_WORKERS):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._hash_latencies = deque(maxlen=5000)
+        self._wait_latencies = deque(maxlen=5000)
+
+    def _run(self, func, *args):
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._hash_latencies.append(finished - started)
+                    self._wait_latencies.append(started - submitted)
+
+        return self._executor.submit(task).result()
+
+    def hash_password(self, password):
+        return self._run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)))
+
+    def check_password(self, password, password_hash):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), _as_bytes(password_hash))
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different work factor than `rounds`."""
+        return get_hash_rounds(password_hash) != self.rounds
+
+    def verify_password(self, password, password_hash):
+        """Check a password. Returns (is_valid, new_hash), where new_hash is set
+        when the stored hash should be replaced because its cost is out of date."""
+        if not self.check_password(password, password_hash):
+            return False, None
+        if self.needs_rehash(password_hash):
+            return True, self.hash_password(password)
+        return True, None
+
+    def get_stats(self):
+        """p50/p99 hashing latency, p50/p99 time spent queued, and the current queue depth."""
+        with self._lock:
+            hash_latencies = sorted(self._hash_latencies)
+            wait_latencies = sorted(self._wait_latencies)
+            queued = self._queued
+        return {
+            'queue_depth': queued,
+            'hash_p50_ms': _percentile_ms(hash_latencies, 0.50),
+            'hash_p99_ms': _percentile_ms(hash_latencies, 0.99),
+            'wait_p50_ms': _percentile_ms(wait_latencies, 0.50),
+            'wait_p99_ms': _percentile_ms(wait_latencies, 0.99),
+            'samples': len(hash_latencies),
+        }
+
+def _as_bytes(password_hash):
+    return password_hash.encode('utf-8') if isinstance(password_hash, str) else password_hash
+
+def _percentile_ms(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+def get_hash_rounds(password_hash):
+    """Work factor of a bcrypt hash such as b'$2b$12$...', or None if it cannot be read."""
+    try:
+        return int(_as_bytes(password_hash).split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+_hasher = PasswordHasher()
+
+def configure_password_hashing(rounds=BCRYPT_ROUNDS, max_workers=HASH_WORKERS):
+    """Replace the shared hasher, e.g. to change the target work factor."""
+    global _hasher
+    _hasher = PasswordHasher(rounds, max_workers)
+
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return _hasher.hash_password(password)
 
 def check_password(password, password_hash):
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash)
\ No newline at end of file
+    return _hasher.check_password(password, password_hash)
+
+def verify_password(password, password_hash):
+    return _hasher.verify_password(password, password_hash)
+
+def get_hashing_stats():
+    return _hasher.get_stats()
@@ -0,0 +1,161 @@
+# vote_queue.py
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from repository import get_repository
+
+# Batched vote ingestion. When enabled, votes are handed to a single writer
+# thread that commits them in groups ("group commit") instead of opening one
+# write transaction per vote, which avoids pile-ups on SQLite's write lock
+# when a popular poll opens.
+BATCHING_ENABLED = False
+BATCH_INTERVAL_MS = 20
+BATCH_MAX_VOTES = 200
+
+_STOP = object()
+
+class VoteWriter:
+    """Background writer that coalesces queued votes into one transaction per batch."""
+
+    def __init__(self, interval_ms=BATCH_INTERVAL_MS, max_votes=BATCH_MAX_VOTES):
+        self.interval = interval_ms / 1000
+        self.max_votes = max_votes
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=10000)
+        self._batch_sizes = deque(maxlen=1000)
+        self._started_at = time.monotonic()
+        self.votes_written = 0
+        self.votes_failed = 0
+        self.batches = 0
+        self._stopped = False
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='vote-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, poll_id, option_id, user_id):
+        """Queue a vote. The returned future resolves to its vote_id once committed."""
+        future = Future()
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError("The vote writer has been stopped.")
+            self._queue.put((poll_id, option_id, user_id, time.perf_counter(), future))
+        return future
+
+    def stop(self):
+        """Write everything still queued, then stop the writer thread.
+
+        get_vote_writer() starts a new writer afterwards.
+        """
+        global _writer
+        with _writer_lock:
+            if _writer is self:
+                _writer = None
+        with self._submit_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.interval
+            while len(batch) < self.max_votes:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            vote_ids = get_repository().cast_votes([
+                (poll_id, option_id, user_id) for poll_id, option_id, user_id, _, _ in batch
+            ])
+            results = [(item, vote_id, None) for item, vote_id in zip(batch, vote_ids)]
+        except Exception:
+            # Retry one by one so a single bad vote does not fail the whole batch.
+            results = []
+            for item in batch:
+                try:
+                    results.append((item, get_repository().cast_vote(*item[:3]), None))
+                except Exception as error:
+                    results.append((item, None, error))
+
+        now = time.perf_counter()
+        with self._stats_lock:
+            self.batches += 1
+            self._batch_sizes.append(len(batch))
+            for item, _, error in results:
+                if error is None:
+                    self.votes_written += 1
+                    self._latencies.append(now - item[3])
+                else:
+                    self.votes_failed += 1
+
+        for item, vote_id, error in results:
+            future = item[4]
+            if error is None:
+                future.set_result(vote_id)
+            else:
+                future.set_exception(error)
+
+    def get_stats(self):
+        """Throughput and latency counters for tuning the batch window."""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            batch_sizes = list(self._batch_sizes)
+            elapsed = time.monotonic() - self._started_at
+            stats = {
+                'queue_depth': self._queue.qsize(),
+                'votes_written': self.votes_written,
+                'votes_failed': self.votes_failed,
+                'batches': self.batches,
+                'avg_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0,
+                'votes_per_second': self.votes_written / elapsed if elapsed else 0,
+                'latency_p50_ms': None,
+                'latency_p99_ms': None,
+            }
+        if latencies:
+            stats['latency_p50_ms'] = latencies[len(latencies) // 2] * 1000
+            stats['latency_p99_ms'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        return stats
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_vote_writer():
+    """Return the process-wide vote writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = VoteWriter()
+        return _writer
+
+def submit_vote(poll_id, option_id, user_id):
+    """Record a vote, batched when BATCHING_ENABLED. Returns a future resolving to the vote_id."""
+    if BATCHING_ENABLED:
+        return get_vote_writer().submit(poll_id, option_id, user_id)
+    future = Future()
+    try:
+        future.set_result(get_repository().cast_vote(poll_id, option_id, user_id))
+    except Exception as error:
+        future.set_exception(error)
+    return future